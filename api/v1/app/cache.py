@@ -0,0 +1,228 @@
+"""
+This module provides the in-process caches used by the FastAPI application.
+
+Classes:
+- TTLCache: Size-bounded LRU cache whose entries expire after a time-to-live.
+- TaggedTTLCache: TTLCache whose entries can be invalidated together by tag.
+- SingleFlight: Collapses concurrent calls for the same key into one computation.
+
+Objects:
+- MISSING: Sentinel returned by `TTLCache.get` when a key is absent or expired.
+
+"""
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+
+MISSING = object()
+
+
+class TTLCache:
+    """
+    Size-bounded LRU cache whose entries expire after a time-to-live.
+
+    Entries may carry their own TTL, which is how short-lived negative entries are stored next
+    to regular ones. Hit, miss, eviction and expiration counters are kept for monitoring.
+
+    Args:
+        maxsize: Maximum number of entries; the least recently used entry is evicted beyond it.
+        ttl: Default time-to-live of an entry, in seconds.
+
+    """
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=MISSING):
+        """
+        Returns the cached value for the key, or `default` if it is absent or expired.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl: float = None):
+        """
+        Stores a value, evicting least recently used entries beyond `maxsize`.
+
+        Args:
+            key: The cache key.
+            value: The value to store.
+            ttl: Time-to-live of this entry in seconds (default: the cache's `ttl`).
+
+        """
+        with self._lock:
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._remove(next(iter(self._data)))
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def _remove(self, key):
+        self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class TaggedTTLCache(TTLCache):
+    """
+    TTLCache whose entries can be invalidated together by tag.
+
+    Each entry may be stored under any number of tags, such as the ID of the object it was built
+    from, and `invalidate` drops every entry carrying a tag. The tag index only holds keys that
+    are still cached, so it is bounded by `maxsize` as well.
+
+    Args:
+        maxsize: Maximum number of entries; the least recently used entry is evicted beyond it.
+        ttl: Default time-to-live of an entry, in seconds.
+
+    """
+    def __init__(self, maxsize: int, ttl: float):
+        super().__init__(maxsize, ttl)
+        self._tags = {}
+        self._key_tags = {}
+        self.invalidations = 0
+
+    def set(self, key, value, ttl: float = None, tags=()):
+        """
+        Stores a value under the given tags, evicting least recently used entries beyond `maxsize`.
+
+        Args:
+            key: The cache key.
+            value: The value to store.
+            ttl: Time-to-live of this entry in seconds (default: the cache's `ttl`).
+            tags: Tags the entry can be invalidated by.
+
+        """
+        with self._lock:
+            self._remove(key)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            self._key_tags[key] = tuple(tags)
+        super().set(key, value, ttl=ttl)
+
+    def invalidate(self, tag):
+        """
+        Drops every entry stored under the tag.
+
+        Returns:
+            int: The number of entries dropped.
+
+        """
+        with self._lock:
+            keys = list(self._tags.get(tag, ()))
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._tags.clear()
+            self._key_tags.clear()
+
+    def stats(self):
+        stats = super().stats()
+        stats["invalidations"] = self.invalidations
+        return stats
+
+    def _remove(self, key):
+        super()._remove(key)
+        for tag in self._key_tags.pop(key, ()):
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls for the same key into one computation.
+
+    The first caller for a key starts the computation as a task; callers arriving while it runs
+    wait for the same task instead of starting their own. The task is shielded, so a caller
+    going away (a client disconnecting) does not cancel it for the others. Nothing is kept once
+    the task finishes.
+    """
+    def __init__(self):
+        self._tasks = {}
+        self.calls = 0
+        self.collapsed = 0
+
+    def __len__(self):
+        return len(self._tasks)
+
+    async def do(self, key, fn):
+        """
+        Returns the result of `fn()`, sharing it with every concurrent call for the same key.
+
+        Args:
+            key: Identifies calls that produce the same result.
+            fn: A no-argument coroutine function computing the result.
+
+        Returns:
+            The result of the shared call; its exception is raised in every caller.
+
+        """
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._tasks[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+            self.calls += 1
+        else:
+            self.collapsed += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self):
+        return {
+            "in_flight": len(self._tasks),
+            "calls": self.calls,
+            "collapsed": self.collapsed,
+        }
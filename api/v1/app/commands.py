@@ -0,0 +1,176 @@
+"""
+This module provides maintenance and benchmark commands for the VideoHub application.
+
+Usage:
+    python -m api.v1.app.commands <command>
+
+Commands:
+- backfill-users-by-id: Writes a users_by_id row for every existing user.
+- backfill-playlist-items: Copies legacy playlist host_ids lists into playlist_items.
+- backfill-resume-positions: Writes resume_position rows from the latest legacy watch events.
+- bench-auth: Measures per-request authentication cost with and without the token cache.
+- calibrate-password-hash: Picks the bcrypt cost that meets settings.password_hash_target_ms.
+- bench-templates: Measures first-request and steady-state template render time.
+- drain-search-outbox: Pushes every pending search outbox change to the search index.
+- bench-search: Measures local search query latency against index size.
+
+"""
+
+import argparse
+import asyncio
+import random
+import time
+import uuid
+from types import SimpleNamespace
+
+from cassandra.cqlengine.management import sync_table
+
+from api.v1.app import config, database, oauth2, security, shortcuts
+from api.v1.app.indexer import search_indexer
+from api.v1.app.local_search import LocalSearchIndex
+from api.v1.app.models import UserById, ResumePosition, Playlist, PlaylistItem, SearchOutbox, SearchCheckpoint, SearchLease
+
+
+def _report(label, seconds, iterations):
+    print(f"{label:<32} {seconds * 1e6 / iterations:10.2f} us/request")
+
+
+async def backfill_users_by_id():
+    database.get_session()
+    sync_table(UserById)
+    count = await UserById.backfill()
+    print(f"{count} users written to users_by_id")
+
+
+async def backfill_playlist_items():
+    database.get_session()
+    sync_table(PlaylistItem)
+    count = await Playlist.backfill_items()
+    print(f"{count} playlists written to playlist_items")
+
+
+async def backfill_resume_positions():
+    database.get_session()
+    sync_table(ResumePosition)
+    count = await ResumePosition.backfill()
+    print(f"{count} resume positions written to resume_position")
+
+
+async def bench_auth(iterations=20000):
+    backend = oauth2.JWTCookiePayload()
+    token = oauth2.create_access_token(SimpleNamespace(user_id=uuid.uuid4()))
+    cases = [
+        ("anonymous (no cookie)", SimpleNamespace(cookies={}), None),
+        ("jwt.decode every request", SimpleNamespace(cookies={"session_id": token}), oauth2.verify_token),
+        ("cached payload", SimpleNamespace(cookies={"session_id": token}), None),
+    ]
+    for label, request, verify in cases:
+        original = oauth2.verify_token_cached
+        if verify is not None:
+            oauth2.verify_token_cached = verify
+        try:
+            await backend.authenticate(request)
+            started = time.perf_counter()
+            for _ in range(iterations):
+                await backend.authenticate(request)
+            _report(label, time.perf_counter() - started, iterations)
+        finally:
+            oauth2.verify_token_cached = original
+
+
+async def calibrate_password_hash():
+    target_ms = config.get_settings().password_hash_target_ms
+    rounds, measurements = security.calibrate(target_ms)
+    for measured_rounds, elapsed_ms in measurements:
+        print(f"rounds={measured_rounds:<3} {elapsed_ms:10.1f} ms")
+    print(f"Selected rounds={rounds} for a {target_ms:.0f} ms target. Add to .env:")
+    print(f"PASSWORD_HASH_ROUNDS={rounds}")
+
+
+async def bench_templates(iterations=500):
+    template_name = "videos/list.html"
+    request = SimpleNamespace(
+        user=SimpleNamespace(is_authenticated=False), query_params={}, url=SimpleNamespace(path="/api/videos/")
+    )
+    video_list = [
+        SimpleNamespace(host_id=f"video{index}", title=f"Video {index}", path=f"/api/video/video{index}")
+        for index in range(50)
+    ]
+    context = {"video_list": video_list, "next_cursor": None, "request": request}
+
+    def first_render(bytecode_cache):
+        jinja_templates = shortcuts.make_templates(bytecode_cache=bytecode_cache)
+        started = time.perf_counter()
+        jinja_templates.get_template(template_name).render(context)
+        return time.perf_counter() - started
+
+    _report("first render, compile", first_render(False), 1)
+    shortcuts.precompile_templates(shortcuts.make_templates().env)
+    _report("first render, bytecode cache", first_render(True), 1)
+    jinja_templates = shortcuts.make_templates()
+    shortcuts.precompile_templates(jinja_templates.env)
+    template = jinja_templates.get_template(template_name)
+    started = time.perf_counter()
+    for _ in range(iterations):
+        template.render(context)
+    _report("steady state", time.perf_counter() - started, iterations)
+
+
+async def drain_search_outbox():
+    session = database.get_session()
+    sync_table(SearchOutbox)
+    sync_table(SearchCheckpoint)
+    sync_table(SearchLease)
+    database.prepare_statements(session)
+    search_indexer.settle_time = 0
+    count = await search_indexer.drain()
+    print(f"{count} changes pushed to the search index")
+
+
+async def bench_search(iterations=200):
+    rng = random.Random(0)
+    vocabulary = [
+        "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(3, 10)))
+        for _ in range(5000)
+    ]
+    queries = {
+        "exact": [rng.choice(vocabulary) for _ in range(iterations)],
+        "two words": [f"{rng.choice(vocabulary)} {rng.choice(vocabulary)}" for _ in range(iterations)],
+        "prefix": [rng.choice(vocabulary)[:3] for _ in range(iterations)],
+        "typo": [word[:2] + word[3:] for word in (rng.choice(vocabulary) for _ in range(iterations))],
+    }
+    for size in (1000, 10000, 100000):
+        index = LocalSearchIndex()
+        started = time.perf_counter()
+        for number in range(size):
+            title = " ".join(rng.choice(vocabulary) for _ in range(rng.randint(2, 8)))
+            index.upsert({"objectID": str(number), "objectType": "video", "title": title, "path": "/"})
+        print(f"{size} records indexed in {time.perf_counter() - started:.2f} s")
+        for label, words in queries.items():
+            started = time.perf_counter()
+            for query in words:
+                index.search(query)
+            _report(f"  {label}", time.perf_counter() - started, len(words))
+
+
+COMMANDS = {
+    "backfill-users-by-id": backfill_users_by_id,
+    "backfill-playlist-items": backfill_playlist_items,
+    "backfill-resume-positions": backfill_resume_positions,
+    "bench-auth": bench_auth,
+    "calibrate-password-hash": calibrate_password_hash,
+    "bench-templates": bench_templates,
+    "drain-search-outbox": drain_search_outbox,
+    "bench-search": bench_search,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m api.v1.app.commands")
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    args = parser.parse_args(argv)
+    asyncio.run(COMMANDS[args.command]())
+
+
+if __name__ == "__main__":
+    main()
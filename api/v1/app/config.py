@@ -1,5 +1,6 @@
 from functools import lru_cache
 from pathlib import Path
+from typing import Optional
 from pydantic import BaseSettings, Field
 import os
 
@@ -9,15 +10,63 @@ os.environ['CQLENG_ALLOW_SCHEMA_MANAGEMENT'] = '1'
 class Settings(BaseSettings):
     base_dir: Path = Path(__file__).resolve().parent
     template_dir: Path = base_dir / 'templates'
+    template_cache_dir: Path = base_dir / '.jinja_cache'
     keyspace: str = Field(..., env='ASTRADB_KEYSPACE')
     db_client_id: str = Field(..., env='ASTRA_DB_CLIENT_ID')
     db_client_secret: str = Field(..., env='ASTRA_DB_CLIENT_SECRET')
     secret_key: str = Field(..., env='SECRET_KEY')
     algorithm: str = Field(..., env='ALGORITHM')
     access_token_expire_minutes: int = Field(..., env='ACCESS_TOKEN_EXPIRE_MINUTES')
-    algolia_index_name: str
-    algolia_app_id: str
-    algolia_api_key: str
+    algolia_index_name: Optional[str] = None
+    algolia_app_id: Optional[str] = None
+    algolia_api_key: Optional[str] = None
+    page_size: int = 25
+    max_page_size: int = 100
+    stream_max_pages: int = 10
+    template_stream_buffer: int = 50
+    video_cache_size: int = 10000
+    video_cache_ttl: float = 60.0
+    video_cache_negative_ttl: float = 5.0
+    fragment_cache_size: int = 20000
+    fragment_cache_ttl: float = 600.0
+    page_cache_size: int = 1000
+    page_cache_ttl: float = 1.0
+    search_backend: str = "algolia"
+    search_local_hits_per_page: int = 20
+    search_local_snapshot: Path = base_dir / '.search_index.json'
+    search_local_snapshot_max_age: float = 300.0
+    search_cache_size: int = 1000
+    search_cache_ttl: float = 30.0
+    search_outbox_shards: int = 1
+    search_outbox_ttl: int = 7 * 24 * 3600
+    search_indexer_enabled: bool = True
+    search_indexer_batch_size: int = 500
+    search_indexer_interval: float = 5.0
+    search_indexer_settle_time: float = 2.0
+    search_indexer_max_backoff: float = 300.0
+    search_indexer_lease_ttl: int = 60
+    search_reindex_page_size: int = 500
+    search_reindex_batch_size: int = 1000
+    search_reindex_concurrency: int = 4
+    search_reindex_swap: bool = True
+    password_hash_rounds: Optional[int] = Field(None, env='PASSWORD_HASH_ROUNDS')
+    password_hash_target_ms: float = 250.0
+    password_hash_executor: str = "thread"
+    password_hash_workers: int = 4
+    password_hash_concurrency: int = 8
+    password_hash_queue_timeout: float = 2.0
+    token_cache_size: int = 50000
+    token_cache_max_ttl: float = 300.0
+    token_cache_negative_ttl: float = 30.0
+    metrics_token: Optional[str] = Field(None, env='METRICS_TOKEN')
+    db_in_chunk_size: int = 50
+    db_max_concurrency: int = 8
+    watch_buffer_max_pending: int = 10000
+    watch_buffer_flush_size: int = 500
+    watch_buffer_flush_interval: float = 2.0
+    watch_buffer_put_timeout: float = 1.0
+    watch_buffer_batch_statements: int = 50
+    watch_batch_max_items: int = 120
 
     class Config:
         env_file = ".env"
@@ -1,8 +1,14 @@
+import asyncio
+import base64
+import binascii
 import pathlib
+import time
 from cassandra.cluster import Cluster, TokenAwarePolicy, DCAwareRoundRobinPolicy
 from cassandra.auth import PlainTextAuthProvider
+from cassandra.query import BatchStatement, BatchType, SimpleStatement
 from cassandra.cqlengine import connection
 from . import config
+from .exceptions import InvalidCursorException
 
 BASE_DIR = pathlib.Path(__file__).resolve().parent
 
@@ -30,3 +36,578 @@ def get_session():
     connection.register_connection(str(session), session=session)
     connection.set_default_connection(str(session))
     return session
+
+
+def _set_result(future, result):
+    if not future.done():
+        future.set_result(result)
+
+
+def _set_exception(future, exc):
+    if not future.done():
+        future.set_exception(exc)
+
+
+def _row_as_dict(row):
+    return row if isinstance(row, dict) else row._asdict()
+
+
+def execute_async(query, parameters=None):
+    """
+    Executes a query through the driver's ``execute_async`` without blocking the event loop.
+
+    The driver invokes the ``ResponseFuture`` callbacks on its own IO thread, so results are
+    handed back to the running asyncio loop with ``call_soon_threadsafe``. Every result page
+    is fetched before the future resolves.
+
+    Args:
+        query: A CQL string or driver statement.
+        parameters: Optional parameters bound to the query.
+
+    Returns:
+        asyncio.Future: A future resolving to the list of rows as dictionaries.
+
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    rows = []
+    response_future = connection.get_session().execute_async(query, parameters)
+
+    def on_success(page):
+        rows.extend(_row_as_dict(row) for row in page)
+        if response_future.has_more_pages:
+            response_future.start_fetching_next_page()
+        else:
+            loop.call_soon_threadsafe(_set_result, future, rows)
+
+    def on_error(exc):
+        loop.call_soon_threadsafe(_set_exception, future, exc)
+
+    response_future.add_callbacks(on_success, on_error)
+    return future
+
+
+def execute_page(query, parameters=None, page_size=None, paging_state=None):
+    """
+    Executes a query asynchronously and fetches a single page of results.
+
+    Args:
+        query: A CQL string.
+        parameters: Optional parameters bound to the query.
+        page_size: The number of rows per page (default: settings.page_size).
+        paging_state: The driver paging state returned with the previous page, if any.
+
+    Returns:
+        asyncio.Future: A future resolving to a tuple of the page's rows as dictionaries and the
+        paging state of the next page, or None on the last page.
+
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    statement = SimpleStatement(query, fetch_size=page_size or settings.page_size)
+    response_future = connection.get_session().execute_async(statement, parameters, paging_state=paging_state)
+
+    def on_success(page):
+        rows = [_row_as_dict(row) for row in page]
+        next_state = response_future.result().paging_state if response_future.has_more_pages else None
+        loop.call_soon_threadsafe(_set_result, future, (rows, next_state))
+
+    def on_error(exc):
+        loop.call_soon_threadsafe(_set_exception, future, exc)
+
+    response_future.add_callbacks(on_success, on_error)
+    return future
+
+
+def encode_cursor(paging_state):
+    if paging_state is None:
+        return None
+    return base64.urlsafe_b64encode(paging_state).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        return base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+    except (binascii.Error, ValueError):
+        raise InvalidCursorException("Invalid cursor")
+
+
+def _where_clause(model, filters):
+    clauses = []
+    values = []
+    for name, value in filters.items():
+        column = model._columns[name]
+        clauses.append(f"{column.db_field_name} = %s")
+        values.append(column.to_database(column.validate(value)))
+    return " AND ".join(clauses), values
+
+
+def _select(model, filters, limit=None, allow_filtering=False):
+    query = f"SELECT * FROM {model.column_family_name()}"
+    where, values = _where_clause(model, filters)
+    if where:
+        query += f" WHERE {where}"
+    if limit is not None:
+        query += f" LIMIT {int(limit)}"
+    if allow_filtering:
+        query += " ALLOW FILTERING"
+    return query, values
+
+
+async def fetch(model, query, parameters=None):
+    """
+    Runs a query asynchronously and maps every row onto the given model.
+
+    Args:
+        model: The cqlengine model class the rows belong to.
+        query: A CQL string or driver statement.
+        parameters: Optional parameters bound to the query.
+
+    Returns:
+        list: The model instances built from the result rows.
+
+    """
+    rows = await execute_async(query, parameters)
+    return [model._construct_instance(row) for row in rows]
+
+
+async def fetch_all(model):
+    """
+    Fetches every row of the model's table asynchronously.
+
+    Args:
+        model: The cqlengine model class to read.
+
+    Returns:
+        list: All instances of the model.
+
+    """
+    query, values = _select(model, {})
+    return await fetch(model, query, values)
+
+
+async def fetch_page(model, cursor=None, page_size=None, **filters):
+    """
+    Fetches one page of the model's table, optionally restricted to a partition.
+
+    Cursors are the driver's paging state encoded as URL-safe base64, so every page costs one
+    bounded query no matter how large the table is.
+
+    Args:
+        model: The cqlengine model class to read.
+        cursor: The opaque cursor returned with the previous page, if any.
+        page_size: The number of rows per page (default: settings.page_size).
+        **filters: Column equality filters, normally the partition key.
+
+    Returns:
+        tuple: The page's model instances and the cursor of the next page, or None on the last page.
+
+    Raises:
+        InvalidCursorException: If the cursor cannot be decoded.
+
+    """
+    query, values = _select(model, filters)
+    rows, next_state = await execute_page(query, values, page_size=page_size, paging_state=decode_cursor(cursor))
+    return [model._construct_instance(row) for row in rows], encode_cursor(next_state)
+
+
+class RowStream:
+    """
+    Async iterator over the rows of a model's table, fetched one page at a time.
+
+    Iteration stops at the end of the table or after `max_pages` pages (None for no limit),
+    whichever comes first; `next_cursor` is then set to the cursor of the following page (None
+    at the end). Only one page is held in memory at a time. `prefetch` reads the first page
+    ahead of iteration, so errors from the cursor or the driver surface before a caller has
+    committed to a response.
+
+    Args:
+        model: The cqlengine model class to read.
+        cursor: The opaque cursor to start from, if any.
+        page_size: The number of rows per page (default: settings.page_size).
+        max_pages: The maximum number of pages to read, or None to read to the end.
+        **filters: Column equality filters, normally the partition key.
+
+    Raises:
+        InvalidCursorException: If the cursor cannot be decoded.
+
+    """
+    def __init__(self, model, cursor=None, page_size=None, max_pages=1, **filters):
+        self.model = model
+        self.paging_state = decode_cursor(cursor)
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.filters = filters
+        self.next_cursor = None
+        self._first_page = None
+
+    def __aiter__(self):
+        return self._rows()
+
+    async def prefetch(self):
+        """
+        Reads the first page now instead of on the first iteration.
+
+        Returns:
+            RowStream: The stream itself.
+
+        """
+        if self._first_page is None:
+            query, values = _select(self.model, self.filters)
+            self._first_page = await execute_page(
+                query, values, page_size=self.page_size, paging_state=self.paging_state
+            )
+        return self
+
+    async def _rows(self):
+        query, values = _select(self.model, self.filters)
+        paging_state = self.paging_state
+        pages = 0
+        while self.max_pages is None or pages < self.max_pages:
+            pages += 1
+            if pages == 1 and self._first_page is not None:
+                rows, paging_state = self._first_page
+                self._first_page = None
+            else:
+                rows, paging_state = await execute_page(
+                    query, values, page_size=self.page_size, paging_state=paging_state
+                )
+            for row in rows:
+                yield self.model._construct_instance(row)
+            if paging_state is None:
+                break
+        self.next_cursor = encode_cursor(paging_state)
+
+
+async def fetch_in(model, name, values, chunk_size=None, concurrency=None):
+    """
+    Fetches the rows whose column matches any of the given values.
+
+    The values are de-duplicated and split into ``IN`` queries of at most `chunk_size` keys.
+    The chunks run concurrently, with at most `concurrency` queries in flight.
+
+    Args:
+        model: The cqlengine model class to read.
+        name: The column to match, normally the partition key.
+        values: The values to look up.
+        chunk_size: Maximum number of keys per query (default: settings.db_in_chunk_size).
+        concurrency: Maximum number of queries in flight (default: settings.db_max_concurrency).
+
+    Returns:
+        list: The matching model instances, in no particular order.
+
+    """
+    chunk_size = chunk_size or settings.db_in_chunk_size
+    semaphore = asyncio.Semaphore(concurrency or settings.db_max_concurrency)
+    column = model._columns[name]
+    keys = list(dict.fromkeys(values))
+
+    async def fetch_chunk(chunk):
+        placeholders = ", ".join(["%s"] * len(chunk))
+        query = f"SELECT * FROM {model.column_family_name()} WHERE {column.db_field_name} IN ({placeholders})"
+        async with semaphore:
+            return await fetch(model, query, [column.to_database(column.validate(key)) for key in chunk])
+
+    chunks = await asyncio.gather(
+        *(fetch_chunk(keys[start:start + chunk_size]) for start in range(0, len(keys), chunk_size))
+    )
+    return [obj for chunk in chunks for obj in chunk]
+
+
+class PreparedLookup:
+    """
+    A named, prepared primary key lookup with call and latency counters.
+
+    Args:
+        name: The name the lookup is registered under.
+        model: The cqlengine model class the lookup reads.
+        names: The columns the lookup filters on.
+
+    """
+    def __init__(self, name, model, names):
+        self.name = name
+        self.model = model
+        self.names = names
+        self.statement = None
+        self.calls = 0
+        self.errors = 0
+        self.total_time = 0.0
+
+    @property
+    def query(self):
+        where = " AND ".join(f"{self.model._columns[name].db_field_name} = ?" for name in self.names)
+        return f"SELECT * FROM {self.model.column_family_name()} WHERE {where} LIMIT 2"
+
+    def prepare(self, session):
+        self.statement = session.prepare(self.query)
+
+    def bind(self, filters):
+        values = []
+        for name in self.names:
+            column = self.model._columns[name]
+            values.append(column.to_database(column.validate(filters[name])))
+        return self.statement.bind(values)
+
+    async def fetch(self, filters):
+        started = time.perf_counter()
+        try:
+            rows = await execute_async(self.bind(filters))
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self.calls += 1
+            self.total_time += time.perf_counter() - started
+        return [self.model._construct_instance(row) for row in rows]
+
+    def stats(self):
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "total_ms": round(self.total_time * 1000, 3),
+            "avg_ms": round(self.total_time * 1000 / self.calls, 3) if self.calls else 0.0,
+        }
+
+
+_lookups = {}
+
+
+def register_statement(name, model, *names):
+    """
+    Registers a hot lookup to be prepared at startup.
+
+    Once prepared, `first` and `get` calls on the model that filter on exactly these columns
+    execute the bound statement instead of building and sending a new query string.
+
+    Args:
+        name: The name of the lookup, used in `statement_stats`.
+        model: The cqlengine model class the lookup reads.
+        *names: The columns the lookup filters on.
+
+    """
+    _lookups[(model, frozenset(names))] = PreparedLookup(name, model, names)
+
+
+def prepare_statements(session):
+    """
+    Prepares every registered lookup on the given session.
+
+    Args:
+        session: The session returned by `get_session`.
+
+    """
+    for lookup in _lookups.values():
+        lookup.prepare(session)
+
+
+def statement_stats():
+    """
+    Returns the call and latency counters of every registered lookup, keyed by name.
+    """
+    return {lookup.name: lookup.stats() for lookup in _lookups.values()}
+
+
+async def _lookup(model, filters, allow_filtering=False):
+    lookup = _lookups.get((model, frozenset(filters)))
+    if lookup is not None and lookup.statement is not None and not allow_filtering:
+        return await lookup.fetch(filters)
+    query, values = _select(model, filters, limit=2, allow_filtering=allow_filtering)
+    return await fetch(model, query, values)
+
+
+async def first(model, allow_filtering=False, **filters):
+    """
+    Fetches the first row matching the filters, or None.
+
+    Args:
+        model: The cqlengine model class to read.
+        allow_filtering: Whether to append ALLOW FILTERING to the query.
+        **filters: Column equality filters.
+
+    Returns:
+        The matching model instance, or None if no row matched.
+
+    """
+    objects = await _lookup(model, filters, allow_filtering=allow_filtering)
+    return objects[0] if objects else None
+
+
+async def get(model, allow_filtering=False, **filters):
+    """
+    Fetches exactly one row matching the filters, mirroring ``Model.objects.get``.
+
+    Args:
+        model: The cqlengine model class to read.
+        allow_filtering: Whether to append ALLOW FILTERING to the query.
+        **filters: Column equality filters.
+
+    Returns:
+        The matching model instance.
+
+    Raises:
+        model.DoesNotExist: If no row matched.
+        model.MultipleObjectsReturned: If more than one row matched.
+
+    """
+    objects = await _lookup(model, filters, allow_filtering=allow_filtering)
+    if not objects:
+        raise model.DoesNotExist(f"{model.__name__} matching query does not exist")
+    if len(objects) > 1:
+        raise model.MultipleObjectsReturned(f"Multiple {model.__name__} objects returned")
+    return objects[0]
+
+
+def _insert(instance):
+    instance.validate()
+    model = type(instance)
+    names = []
+    values = []
+    for name, column in model._columns.items():
+        value = getattr(instance, name)
+        if value is None:
+            continue
+        names.append(column.db_field_name)
+        values.append(column.to_database(value))
+    placeholders = ", ".join(["%s"] * len(names))
+    query = f"INSERT INTO {model.column_family_name()} ({', '.join(names)}) VALUES ({placeholders})"
+    return query, values
+
+
+async def save(instance, timestamp=None):
+    """
+    Validates a model instance and writes it with a single asynchronous INSERT.
+
+    Args:
+        instance: The cqlengine model instance to persist.
+        timestamp: An explicit write timestamp in microseconds, so that the write loses to any
+            write made after that time (default: the coordinator's clock).
+
+    Returns:
+        The saved instance.
+
+    """
+    query, values = _insert(instance)
+    if timestamp is not None:
+        query += f" USING TIMESTAMP {int(timestamp)}"
+    await execute_async(query, values)
+    instance._set_persisted()
+    return instance
+
+
+async def save_if_not_exists(instance):
+    """
+    Writes a model instance with a lightweight transaction (``INSERT ... IF NOT EXISTS``).
+
+    Args:
+        instance: The cqlengine model instance to persist.
+
+    Returns:
+        tuple: The row stored under the instance's primary key and whether this call wrote it.
+        When another writer won, the returned instance is built from the existing row.
+
+    """
+    query, values = _insert(instance)
+    rows = await execute_async(f"{query} IF NOT EXISTS", values)
+    row = dict(rows[0])
+    if row.pop("[applied]"):
+        instance._set_persisted()
+        return instance, True
+    return type(instance)._construct_instance(row), False
+
+
+async def save_batch(instances, deletes=(), updates=(), logged=False):
+    """
+    Writes several model instances, and optionally deletes or updates others, in one batch.
+
+    Unlogged batches are only cheap when every statement targets the same partition, so
+    callers are expected to group instances by partition key before calling this. Rows of
+    other tables in the same keyspace that share the partition key value live on the same
+    replicas, so they may be included too. Logged batches are for writes to different
+    partitions that must all apply or none.
+
+    Args:
+        instances: The cqlengine model instances to persist.
+        deletes: The cqlengine model instances to delete.
+        updates: (instance, values) pairs; only the given columns of each instance are written.
+        logged: Whether to write a LOGGED batch, which the cluster replays until every
+            statement applies.
+
+    Returns:
+        list: The saved instances.
+
+    """
+    batch = BatchStatement(batch_type=BatchType.LOGGED if logged else BatchType.UNLOGGED)
+    for instance in instances:
+        batch.add(*_insert(instance))
+    for instance in deletes:
+        batch.add(*_delete(instance))
+    for instance, values in updates:
+        batch.add(*_update(instance, values))
+    await execute_async(batch)
+    for instance in instances:
+        instance._set_persisted()
+    return instances
+
+
+def _delete(instance):
+    model = type(instance)
+    filters = {name: getattr(instance, name) for name in model._primary_keys}
+    where, values = _where_clause(model, filters)
+    return f"DELETE FROM {model.column_family_name()} WHERE {where}", values
+
+
+def _update(instance, values):
+    model = type(instance)
+    assignments = []
+    parameters = []
+    for name, value in values.items():
+        setattr(instance, name, value)
+        column = model._columns[name]
+        assignments.append(f"{column.db_field_name} = %s")
+        parameters.append(column.to_database(column.validate(value)))
+    where, key_values = _where_clause(model, {name: getattr(instance, name) for name in model._primary_keys})
+    return f"UPDATE {model.column_family_name()} SET {', '.join(assignments)} WHERE {where}", parameters + key_values
+
+
+async def update(instance, if_exists=False, **values):
+    """
+    Sets the given columns on a model instance and writes only those columns.
+
+    Args:
+        instance: The cqlengine model instance to update.
+        if_exists: Whether to write with a lightweight transaction (``UPDATE ... IF EXISTS``),
+            for rows that are otherwise written with ``IF NOT EXISTS``.
+        **values: The column values to set.
+
+    Returns:
+        The updated instance.
+
+    Raises:
+        DoesNotExist: If `if_exists` is set and the row does not exist.
+
+    """
+    model = type(instance)
+    query, parameters = _update(instance, values)
+    if if_exists:
+        rows = await execute_async(f"{query} IF EXISTS", parameters)
+        if not rows[0]["[applied]"]:
+            raise model.DoesNotExist(f"{model.__name__} matching query does not exist")
+    else:
+        await execute_async(query, parameters)
+    return instance
+
+
+async def delete(instance, if_exists=False):
+    """
+    Deletes a model instance by its primary key asynchronously.
+
+    Args:
+        instance: The cqlengine model instance to delete.
+        if_exists: Whether to delete with a lightweight transaction (``DELETE ... IF EXISTS``),
+            for rows that are otherwise written with ``IF NOT EXISTS``.
+
+    """
+    query, values = _delete(instance)
+    await execute_async(f"{query} IF EXISTS" if if_exists else query, values)
@@ -1,6 +1,15 @@
 from fastapi import Request, HTTPException, status
+from fastapi.responses import Response
 from functools import wraps
+from api.v1.app import config
+from api.v1.app.cache import TTLCache, SingleFlight, MISSING
 from api.v1.app.exceptions import HandleExceptions
+from api.v1.app.shortcuts import is_htmx, is_not_modified, not_modified
+
+settings = config.get_settings()
+
+page_cache = TTLCache(maxsize=settings.page_cache_size, ttl=settings.page_cache_ttl)
+page_flights = SingleFlight()
 
 
 credentials_exception = HTTPException(
@@ -31,3 +40,56 @@ def login_required(func):
             raise HandleExceptions(status_code=status.HTTP_401_UNAUTHORIZED)
         return await func(request, *args, **kwargs)
     return wrapper
+
+
+def anonymous_cache(func):
+    """
+    Decorator to share rendered pages between anonymous visitors.
+
+    Requests from signed-in users go straight to the endpoint. Anonymous GETs are keyed by path,
+    query string and HTMX header; concurrent identical requests are collapsed into one call of the
+    endpoint through `page_flights`, and successful responses are kept in `page_cache` for
+    settings.page_cache_ttl seconds. Streaming responses are read to the end before they are
+    shared, so pages that rely on an early flush should not use this decorator. Responses
+    setting cookies are never cached.
+
+    Args:
+        func (callable): The function to be decorated.
+
+    Returns:
+        callable: The decorated function.
+
+    """
+    @wraps(func)
+    async def wrapper(request: Request, *args, **kwargs):
+        if request.user.is_authenticated or request.method != "GET":
+            return await func(request, *args, **kwargs)
+        key = (request.url.path, request.url.query, is_htmx(request))
+        page = page_cache.get(key)
+        if page is MISSING:
+            # The endpoint may answer a conditional request with a 304, which is only valid for
+            # requests carrying the same validators.
+            flight_key = key + (request.headers.get("if-none-match"),)
+            page = await page_flights.do(flight_key, lambda: _render_page(key, func(request, *args, **kwargs)))
+        status_code, headers, body = page
+        validators = {"ETag": headers.get("etag")}
+        if status_code == 200 and validators["ETag"] and is_not_modified(request, validators):
+            return not_modified(headers)
+        return Response(body, status_code=status_code, headers=headers)
+    return wrapper
+
+
+async def _render_page(key, call):
+    response = await call
+    body = getattr(response, "body", None)
+    if body is None:
+        chunks = [
+            chunk if isinstance(chunk, bytes) else chunk.encode(response.charset)
+            async for chunk in response.body_iterator
+        ]
+        body = b"".join(chunks)
+    headers = {k: v for k, v in response.headers.items() if k != "content-length"}
+    page = (response.status_code, headers, body)
+    if response.status_code == 200 and "set-cookie" not in headers:
+        page_cache.set(key, page)
+    return page
@@ -15,3 +15,19 @@ class VideoExistException(Exception):
 
 class InvalidUserExceptions(Exception):
     pass
+
+
+class PlaylistNotFoundException(Exception):
+    pass
+
+
+class BufferFullException(Exception):
+    pass
+
+
+class InvalidCursorException(Exception):
+    pass
+
+
+class PasswordHashThrottledException(Exception):
+    pass
@@ -0,0 +1,104 @@
+"""
+This module provides the fragment cache for rendered template snippets.
+
+Fragments are keyed by the name of the template they come from plus the values they are
+rendered from, and tagged with the first of those values so that every fragment built from an
+object can be dropped when it changes.
+
+Templates opt in with the `cache` tag::
+
+    {% cache video.host_id, video.path, video.title %}
+        ...
+    {% endcache %}
+
+Classes:
+- FragmentCacheExtension: Jinja2 extension providing the `{% cache %}` tag.
+
+Functions:
+- render_cached: Renders a whole template through the fragment cache.
+- invalidate_fragments: Drops every cached fragment tagged with a value.
+
+Objects:
+- fragment_cache: The process-wide fragment cache.
+
+"""
+
+from jinja2 import nodes
+from jinja2.ext import Extension
+
+from api.v1.app import config
+from api.v1.app.cache import TaggedTTLCache, MISSING
+
+settings = config.get_settings()
+
+fragment_cache = TaggedTTLCache(maxsize=settings.fragment_cache_size, ttl=settings.fragment_cache_ttl)
+
+
+class FragmentCacheExtension(Extension):
+    """
+    Jinja2 extension providing the `{% cache tag, *inputs %}...{% endcache %}` tag.
+
+    The body is rendered once per distinct (template name, tag, inputs) and served from
+    `fragment_cache` afterwards. Every value the body depends on must be listed, since anything
+    left out is frozen into the cached output. Works in both sync and async environments.
+    """
+    tags = {"cache"}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        while parser.stream.skip_if("comma"):
+            args.append(parser.parse_expression())
+        body = parser.parse_statements(("name:endcache",), drop_needle=True)
+        call = self.call_method("_cache_support", [nodes.Const(parser.name), nodes.List(args)])
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def _cache_support(self, template_name, args, caller):
+        key = (template_name, *args)
+        value = fragment_cache.get(key)
+        if value is not MISSING:
+            return value
+        if self.environment.is_async:
+            return self._render_async(key, args[0], caller)
+        return self._store(key, args[0], caller())
+
+    async def _render_async(self, key, tag, caller):
+        return self._store(key, tag, await caller())
+
+    @staticmethod
+    def _store(key, tag, value):
+        fragment_cache.set(key, value, tags=(tag,))
+        return value
+
+
+def render_cached(env, template_name: str, context: dict, tag):
+    """
+    Render a template through the fragment cache.
+
+    Args:
+        env: The Jinja2 environment to load the template from.
+        template_name: The name of the template to render.
+        context: The values the template is rendered from; they form part of the key.
+        tag: The value the fragment is invalidated by.
+
+    Returns:
+        str: The rendered template.
+
+    """
+    key = (template_name, tag, *sorted(context.items()))
+    value = fragment_cache.get(key)
+    if value is MISSING:
+        value = env.get_template(template_name).render(context)
+        fragment_cache.set(key, value, tags=(tag,))
+    return value
+
+
+def invalidate_fragments(*tags):
+    """
+    Drop every cached fragment tagged with one of the values.
+
+    Returns:
+        int: The number of fragments dropped.
+
+    """
+    return sum(fragment_cache.invalidate(tag) for tag in tags)
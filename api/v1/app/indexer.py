@@ -0,0 +1,301 @@
+"""
+This module provides the background indexer that keeps the search index in step with the
+database.
+
+Model writes record the objects they change in the `search_outbox` table. The indexer drains it
+in time order, one batch at a time: it reads the current rows of the changed objects, sends
+partial updates for the ones that exist and deletes the rest, then saves its position in
+`search_checkpoint` and removes the drained changes. A failed batch is retried with exponential
+backoff, starting again from the last checkpoint, so the cost of keeping search fresh follows
+the rate of change rather than the size of the catalog.
+
+Every worker process runs an indexer, so each shard is drained under a lease in
+`search_lease`: when a shard has settled changes, the indexer takes its lease with a lightweight
+transaction for the duration of the drain, renews it before each batch, and skips the shard
+while another process holds it. Checking for changes is two plain reads, so an idle shard costs
+each worker no lightweight transactions. Without it, two workers draining the same shard could push an older read of an object
+after a newer one, and move the checkpoint backwards. A full rebuild holds every shard's lease
+until the rebuilt index has replaced the live one, so the changes recorded meanwhile are pushed
+to the new index rather than to the one being replaced.
+
+With the local search backend every process has its own in-memory index, so each one reads the
+outbox from the time its index was built, keeps its position in memory and leaves the rows to
+expire.
+
+Classes:
+- SearchIndexer: Drains the search outbox into the search index.
+
+Objects:
+- search_indexer: The process-wide indexer, started and stopped with the application.
+
+"""
+
+import asyncio
+import contextlib
+import logging
+import random
+import time
+import uuid
+from datetime import datetime
+
+from cassandra.util import max_uuid_from_time, min_uuid_from_time
+
+from api.v1.app import config, database, search_client
+from api.v1.app.models import Playlist, Video, SearchOutbox, SearchCheckpoint, SearchLease
+
+settings = config.get_settings()
+
+logger = logging.getLogger(__name__)
+
+
+class SearchIndexer:
+    """
+    Drains the search outbox into the search index.
+
+    Args:
+        batch_size: Maximum number of changes pushed per batch.
+        interval: Seconds between drains.
+        settle_time: Changes younger than this are left for the next drain, so rows written by
+            servers with a slightly late clock, or recorded just ahead of a conditional write
+            that has yet to apply, are not skipped by the checkpoint.
+        max_backoff: Upper bound, in seconds, of the delay between retries after a failure.
+        lease_ttl: Seconds a shard lease lasts unless renewed; renewals happen once per batch.
+
+    """
+    def __init__(
+        self,
+        batch_size: int = settings.search_indexer_batch_size,
+        interval: float = settings.search_indexer_interval,
+        settle_time: float = settings.search_indexer_settle_time,
+        max_backoff: float = settings.search_indexer_max_backoff,
+        lease_ttl: int = settings.search_indexer_lease_ttl,
+    ):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.settle_time = settle_time
+        self.max_backoff = max_backoff
+        self.lease_ttl = lease_ttl
+        self.owner = str(uuid.uuid4())
+        self.pushed = 0
+        self.failures = 0
+        self._local_checkpoints = {}
+        self._leases = set()
+        self._lock = None
+        self._task = None
+
+    def start(self):
+        """
+        Starts the background drain loop on the running event loop.
+        """
+        self._lock = asyncio.Lock()
+        self._task = asyncio.create_task(self._run())
+
+    @contextlib.asynccontextmanager
+    async def _locked(self):
+        if self._lock is None:
+            yield
+        else:
+            async with self._lock:
+                yield
+
+    @contextlib.asynccontextmanager
+    async def paused(self):
+        """
+        Holds off drains for the duration of the block, such as a full rebuild into a temporary
+        index; changes recorded meanwhile stay in the outbox and are pushed once it ends.
+
+        With a shared search index the block also waits for the lease of every outbox shard and
+        renews the leases until it ends, so no other process drains into an index that is about
+        to be replaced.
+        """
+        async with self._locked():
+            if search_client.is_local():
+                yield
+                return
+            shards = range(settings.search_outbox_shards)
+            while not all(await asyncio.gather(*(self._acquire(shard) for shard in shards))):
+                await asyncio.gather(*(self._release(shard) for shard in shards if shard in self._leases))
+                await asyncio.sleep(random.uniform(0.5, 1.5))
+            renewal = asyncio.create_task(self._renew(shards))
+            try:
+                yield
+            finally:
+                renewal.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await renewal
+                await asyncio.gather(*(self._release(shard) for shard in shards), return_exceptions=True)
+
+    async def stop(self):
+        """
+        Stops the drain loop and releases the shard leases it holds; undrained changes stay in
+        the outbox for the next start.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for shard in list(self._leases):
+            try:
+                await self._release(shard)
+            except Exception as e:
+                logger.warning("Could not release the search outbox lease of shard %s: %s", shard, e)
+
+    async def drain(self):
+        """
+        Pushes every settled change of every outbox shard.
+
+        Returns:
+            int: The number of changes pushed.
+
+        """
+        async with self._locked():
+            counts = await asyncio.gather(
+                *(self.drain_shard(shard) for shard in range(settings.search_outbox_shards))
+            )
+        return sum(counts)
+
+    async def drain_shard(self, shard):
+        """
+        Pushes the settled changes of one outbox shard, batch by batch, while holding its lease.
+
+        Args:
+            shard (int): The outbox partition to drain.
+
+        Returns:
+            int: The number of changes pushed.
+
+        """
+        if search_client.is_local():
+            if search_client.local_index_built_at is None:
+                return 0
+            after = self._local_checkpoints.get(shard) or min_uuid_from_time(
+                search_client.local_index_built_at - self.settle_time
+            )
+            return await self._drain(shard, after, local=True)
+        # An idle shard costs two plain reads; the lease is only taken when there is work.
+        if not await self._has_changes(shard, await self._checkpoint(shard)):
+            return 0
+        if not await self._acquire(shard):
+            return 0
+        try:
+            # Another process may have drained the shard since the checkpoint was read.
+            return await self._drain(shard, await self._checkpoint(shard), local=False)
+        finally:
+            await self._release(shard)
+
+    async def _checkpoint(self, shard):
+        checkpoint = await database.first(SearchCheckpoint, shard=shard)
+        return checkpoint.change_id if checkpoint is not None and checkpoint.change_id else min_uuid_from_time(0)
+
+    async def _has_changes(self, shard, after):
+        rows = await database.execute_async(
+            f"SELECT change_id FROM {SearchOutbox.column_family_name()} "
+            f"WHERE shard = %s AND change_id > %s AND change_id <= %s LIMIT 1",
+            [shard, after, max_uuid_from_time(time.time() - self.settle_time)]
+        )
+        return bool(rows)
+
+    async def _drain(self, shard, after, local):
+        table = SearchOutbox.column_family_name()
+        until = max_uuid_from_time(time.time() - self.settle_time)
+        query = (
+            f"SELECT * FROM {table} WHERE shard = %s AND change_id > %s AND change_id <= %s "
+            f"LIMIT {int(self.batch_size)}"
+        )
+        count = 0
+        while True:
+            changes = await database.fetch(SearchOutbox, query, [shard, after, until])
+            if not changes:
+                break
+            await self._push(changes)
+            after = changes[-1].change_id
+            if local:
+                self._local_checkpoints[shard] = after
+            else:
+                await database.save(SearchCheckpoint(shard=shard, change_id=after, updated=datetime.utcnow()))
+                await database.execute_async(
+                    f"DELETE FROM {table} WHERE shard = %s AND change_id <= %s", [shard, after]
+                )
+            count += len(changes)
+            self.pushed += len(changes)
+            if len(changes) < self.batch_size:
+                break
+            if not local and not await self._acquire(shard):
+                break
+        return count
+
+    async def _acquire(self, shard):
+        """
+        Takes or renews this indexer's lease on an outbox shard.
+
+        Returns:
+            bool: Whether the lease is held by this indexer.
+
+        """
+        table = SearchLease.column_family_name()
+        ttl = int(self.lease_ttl)
+        if shard in self._leases:
+            rows = await database.execute_async(
+                f"UPDATE {table} USING TTL {ttl} SET owner = %s WHERE shard = %s IF owner = %s",
+                [self.owner, shard, self.owner]
+            )
+        else:
+            rows = await database.execute_async(
+                f"INSERT INTO {table} (shard, owner) VALUES (%s, %s) IF NOT EXISTS USING TTL {ttl}",
+                [shard, self.owner]
+            )
+        if rows[0]["[applied]"]:
+            self._leases.add(shard)
+            return True
+        self._leases.discard(shard)
+        return False
+
+    async def _renew(self, shards):
+        while True:
+            await asyncio.sleep(self.lease_ttl / 3)
+            for shard in shards:
+                try:
+                    if not await self._acquire(shard):
+                        logger.warning("Lost the search outbox lease of shard %s during a rebuild", shard)
+                except Exception as e:
+                    logger.warning("Could not renew the search outbox lease of shard %s: %s", shard, e)
+
+    async def _release(self, shard):
+        self._leases.discard(shard)
+        await database.execute_async(
+            f"DELETE FROM {SearchLease.column_family_name()} WHERE shard = %s IF owner = %s",
+            [shard, self.owner]
+        )
+
+    async def _push(self, changes):
+        host_ids = {change.object_id for change in changes if change.object_type == "video"}
+        db_ids = {change.object_id for change in changes if change.object_type == "playlist"}
+        videos, playlists = await asyncio.gather(
+            database.fetch_in(Video, "host_id", list(host_ids)),
+            database.fetch_in(Playlist, "db_id", [uuid.UUID(db_id) for db_id in db_ids]),
+        )
+        records = [search_client.video_record(video) for video in videos]
+        records += [search_client.playlist_record(playlist) for playlist in playlists]
+        deleted_ids = (host_ids - {video.host_id for video in videos}) | (db_ids - {str(p.db_id) for p in playlists})
+        await search_client.push_changes(records, deleted_ids)
+
+    async def _run(self):
+        delay = self.interval
+        while True:
+            await asyncio.sleep(delay)
+            try:
+                await self.drain()
+                delay = self.interval
+            except Exception as e:
+                self.failures += 1
+                delay = min(delay * 2, self.max_backoff)
+                logger.warning("Search outbox drain failed, retrying in %.0fs: %s", delay, e)
+
+    def stats(self):
+        return {"pushed": self.pushed, "failures": self.failures}
+
+
+search_indexer = SearchIndexer()
@@ -0,0 +1,194 @@
+"""
+This module provides the write-behind buffer for watch-event heartbeats.
+
+The player posts a heartbeat every few seconds per viewer, and only the latest one matters for
+resuming playback. Heartbeats are accepted into memory, coalesced per (user_id, host_id) and
+flushed in per-partition UNLOGGED batches once enough are pending or the flush interval elapses.
+Batches are capped at `watch_buffer_batch_statements` statements, so a popular video cannot
+produce a batch over Cassandra's `batch_size_fail_threshold_in_kb`.
+
+Classes:
+- WatchEventBuffer: Bounded in-process buffer that coalesces and batches watch events.
+
+Objects:
+- watch_event_buffer: The process-wide buffer, started and stopped with the application.
+
+"""
+
+import asyncio
+import logging
+import uuid
+from collections import defaultdict
+
+from api.v1.app import config, database
+from api.v1.app.exceptions import BufferFullException
+from api.v1.app.models import WatchEvent, ResumePosition
+
+settings = config.get_settings()
+
+logger = logging.getLogger(__name__)
+
+
+class WatchEventBuffer:
+    """
+    Coalescing write-behind buffer for watch events.
+
+    Args:
+        max_pending: Maximum number of distinct (user_id, host_id) entries held in memory.
+        flush_size: Number of pending entries that triggers an early flush.
+        flush_interval: Seconds between periodic flushes.
+        put_timeout: Seconds `add` waits for room when the buffer is full.
+        batch_statements: Maximum number of statements per batch.
+
+    """
+    def __init__(
+        self,
+        max_pending: int = settings.watch_buffer_max_pending,
+        flush_size: int = settings.watch_buffer_flush_size,
+        flush_interval: float = settings.watch_buffer_flush_interval,
+        put_timeout: float = settings.watch_buffer_put_timeout,
+        batch_statements: int = settings.watch_buffer_batch_statements,
+    ):
+        self.max_pending = max_pending
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.batch_statements = batch_statements
+        self._pending = {}
+        self._stopping = False
+        self._flush_requested = None
+        self._drained = None
+        self._flush_lock = None
+        self._task = None
+
+    def __len__(self):
+        return len(self._pending)
+
+    def start(self):
+        """
+        Starts the background flush loop on the running event loop.
+        """
+        self._flush_requested = asyncio.Event()
+        self._drained = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Stops the flush loop and writes out everything still pending.
+
+        The loop is asked to exit rather than cancelled, so a flush in progress completes (and
+        re-queues whatever it failed to write) before the final flush runs.
+        """
+        if self._task is not None:
+            self._stopping = True
+            self._flush_requested.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    async def add(self, data: dict):
+        """
+        Accepts a watch event, replacing any pending event for the same user and video.
+
+        Args:
+            data: The watch event fields, including `host_id` and `user_id`.
+
+        Raises:
+            BufferFullException: If the buffer stays full for longer than `put_timeout`.
+
+        """
+        key = (str(data.get("user_id")), data.get("host_id"))
+        data.setdefault("event_id", uuid.uuid1())
+        while key not in self._pending and len(self._pending) >= self.max_pending:
+            self._drained.clear()
+            self._flush_requested.set()
+            try:
+                await asyncio.wait_for(self._drained.wait(), timeout=self.put_timeout)
+            except asyncio.TimeoutError:
+                raise BufferFullException("Watch event buffer is full")
+        self._pending[key] = data
+        if len(self._pending) >= self.flush_size:
+            self._flush_requested.set()
+
+    async def get_resume_time(self, host_id, user_id):
+        """
+        Returns the resume time for a user and video, preferring an event that is still waiting
+        in the buffer over the stored position.
+
+        Args:
+            host_id: The video's host ID.
+            user_id: The user's ID.
+
+        Returns:
+            float: The position to resume playback from.
+
+        """
+        data = self._pending.get((str(user_id), host_id))
+        if data is not None:
+            return ResumePosition.from_event(data).resume_time
+        return await WatchEvent.get_resume_time(host_id=host_id, user_id=user_id)
+
+    async def flush(self):
+        """
+        Writes all pending events in UNLOGGED batches of at most `batch_statements` statements,
+        each targeting a single partition.
+
+        Events are grouped by `host_id` for the `watch_event` table and by `user_id` for the
+        `resume_position` table. Entries from failed batches are re-queued unless a newer event
+        for the same key arrived in the meantime; `event_id` is fixed when an event is accepted,
+        so a retried batch overwrites rows instead of duplicating them.
+
+        Returns:
+            int: The number of events flushed.
+
+        """
+        async with self._flush_lock:
+            pending, self._pending = self._pending, {}
+            if pending:
+                events = defaultdict(list)
+                positions = defaultdict(list)
+                for key, data in pending.items():
+                    events[data.get("host_id")].append(key)
+                    positions[key[0]].append(key)
+                await asyncio.gather(
+                    *(self._write(pending, chunk, lambda data: WatchEvent(**data)) for chunk in self._chunks(events)),
+                    *(self._write(pending, chunk, ResumePosition.from_event) for chunk in self._chunks(positions)),
+                )
+            self._drained.set()
+        return len(pending)
+
+    def _chunks(self, partitions):
+        for keys in partitions.values():
+            for start in range(0, len(keys), self.batch_statements):
+                yield keys[start:start + self.batch_statements]
+
+    async def _write(self, pending, keys, build):
+        try:
+            await database.save_batch([build(pending[key]) for key in keys])
+        except Exception as e:
+            logger.warning("Watch event flush failed, re-queueing %s events: %s", len(keys), e)
+            self._requeue(pending, keys)
+        except asyncio.CancelledError:
+            self._requeue(pending, keys)
+            raise
+
+    def _requeue(self, pending, keys):
+        for key in keys:
+            self._pending.setdefault(key, pending[key])
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.exception("Watch event flush loop error: %s", e)
+
+
+watch_event_buffer = WatchEventBuffer()
@@ -0,0 +1,270 @@
+"""
+This module provides an in-process full-text search index, used in place of Algolia when
+settings.search_backend is "local".
+
+Records are the same dictionaries pushed to Algolia (`objectID`, `objectType`, `title`, `path`)
+and search responses have the same `hits`/`nbHits` shape. Titles are tokenized into an inverted
+index of term frequencies. Query words match exactly, with typos (one for words of 4 to 7
+characters, two from 8 characters) and, for the last word, as a prefix; every query word must
+match. Matches are ranked with BM25, exact matches weighing more than prefix and typo matches.
+
+Classes:
+- LocalSearchIndex: Inverted index over search records with incremental updates.
+
+Functions:
+- tokenize: Splits text into lower-case, accent-free words.
+
+"""
+
+import bisect
+import heapq
+import math
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+
+WORD_RE = re.compile(r"\w+")
+
+EXACT_WEIGHT = 1.0
+PREFIX_WEIGHT = 0.7
+TYPO_WEIGHTS = {1: 0.6, 2: 0.4}
+MAX_PREFIX_EXPANSIONS = 50
+
+
+def tokenize(text):
+    if not text:
+        return []
+    text = unicodedata.normalize("NFKD", str(text).lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return WORD_RE.findall(text)
+
+
+def _allowed_typos(word):
+    if len(word) >= 8:
+        return 2
+    if len(word) >= 4:
+        return 1
+    return 0
+
+
+def _indexed_typos(term):
+    # A query word allowed one typo has at least 4 characters and one allowed two has at least
+    # 8, so the terms it can reach have at least 3 and 6 characters respectively.
+    if len(term) >= 6:
+        return 2
+    if len(term) >= 3:
+        return 1
+    return 0
+
+
+def _deletes(word, distance):
+    variants = {word}
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {variant[:i] + variant[i + 1:] for variant in frontier for i in range(len(variant))}
+        variants |= frontier
+    return variants
+
+
+def _distance(a, b, limit):
+    """
+    Returns the optimal string alignment distance between two words, or `limit + 1` once it is
+    known to exceed `limit`.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class LocalSearchIndex:
+    """
+    Inverted index over search records with incremental updates.
+
+    Typo candidates are found through a table of the words obtained by deleting up to two
+    characters from each indexed term, then checked with an edit distance, so a lookup costs a
+    few dictionary probes instead of a scan of the vocabulary. Prefix matches use a sorted copy
+    of the vocabulary, re-sorted lazily after updates.
+
+    Args:
+        hits_per_page: Maximum number of hits returned per search.
+        k1: BM25 term-frequency saturation.
+        b: BM25 length normalization.
+
+    """
+    def __init__(self, hits_per_page: int = 20, k1: float = 1.2, b: float = 0.75):
+        self.hits_per_page = hits_per_page
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._records = {}
+        self._doc_terms = {}
+        self._doc_lengths = {}
+        self._postings = {}
+        self._deletes = {}
+        self._vocabulary = []
+        self._vocabulary_stale = False
+        self._total_length = 0
+
+    def __len__(self):
+        return len(self._records)
+
+    def records(self):
+        """
+        Returns a copy of every indexed record.
+        """
+        with self._lock:
+            return [dict(record) for record in self._records.values()]
+
+    def upsert(self, record):
+        """
+        Adds a record, replacing any record with the same `objectID`.
+        """
+        object_id = str(record["objectID"])
+        terms = Counter(tokenize(record.get("title")))
+        with self._lock:
+            self._remove(object_id)
+            self._records[object_id] = dict(record)
+            self._doc_terms[object_id] = terms
+            self._doc_lengths[object_id] = sum(terms.values())
+            self._total_length += self._doc_lengths[object_id]
+            for term, frequency in terms.items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = {}
+                    self._add_term(term)
+                postings[object_id] = frequency
+
+    def delete(self, object_id):
+        with self._lock:
+            self._remove(str(object_id))
+
+    def apply(self, records, deleted_ids=()):
+        """
+        Applies changed records and deletions, as pushed by the search outbox indexer.
+        """
+        with self._lock:
+            for record in records:
+                self.upsert(record)
+            for object_id in deleted_ids:
+                self.delete(object_id)
+
+    def _remove(self, object_id):
+        terms = self._doc_terms.pop(object_id, None)
+        if terms is None:
+            return
+        del self._records[object_id]
+        self._total_length -= self._doc_lengths.pop(object_id)
+        for term in terms:
+            postings = self._postings[term]
+            del postings[object_id]
+            if not postings:
+                del self._postings[term]
+                self._remove_term(term)
+
+    def _add_term(self, term):
+        for variant in _deletes(term, _indexed_typos(term)):
+            self._deletes.setdefault(variant, set()).add(term)
+        self._vocabulary_stale = True
+
+    def _remove_term(self, term):
+        for variant in _deletes(term, _indexed_typos(term)):
+            terms = self._deletes.get(variant)
+            if terms is not None:
+                terms.discard(term)
+                if not terms:
+                    del self._deletes[variant]
+        self._vocabulary_stale = True
+
+    def _expand(self, word, prefix):
+        """
+        Returns the indexed terms a query word matches, with the weight of each match.
+        """
+        matches = {}
+        if word in self._postings:
+            matches[word] = EXACT_WEIGHT
+        if prefix:
+            if self._vocabulary_stale:
+                self._vocabulary = sorted(self._postings)
+                self._vocabulary_stale = False
+            start = bisect.bisect_left(self._vocabulary, word)
+            for term in self._vocabulary[start:start + MAX_PREFIX_EXPANSIONS]:
+                if not term.startswith(word):
+                    break
+                matches.setdefault(term, PREFIX_WEIGHT)
+        typos = _allowed_typos(word)
+        if typos:
+            candidates = set()
+            for variant in _deletes(word, typos):
+                candidates |= self._deletes.get(variant, set())
+            for term in candidates:
+                if term not in matches:
+                    distance = _distance(word, term, typos)
+                    if distance <= typos:
+                        matches[term] = TYPO_WEIGHTS[distance]
+        return matches
+
+    def search(self, query, hits_per_page=None):
+        """
+        Searches the index.
+
+        Args:
+            query (str): The search query.
+            hits_per_page (int): Maximum number of hits returned (default: the index's setting).
+
+        Returns:
+            dict: `hits` (the best matching records, best first), `nbHits` (the number of
+            matching records), `query` and `processingTimeMS`.
+
+        """
+        started = time.perf_counter()
+        hits_per_page = hits_per_page or self.hits_per_page
+        words = tokenize(query)
+        with self._lock:
+            count = len(self._records)
+            if not words:
+                scores = dict.fromkeys(self._records, 0.0)
+            else:
+                scores = None
+                average_length = self._total_length / count if count else 0.0
+                for position, word in enumerate(words):
+                    word_scores = {}
+                    for term, weight in self._expand(word, prefix=position == len(words) - 1).items():
+                        postings = self._postings[term]
+                        idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                        for object_id, frequency in postings.items():
+                            length = self._doc_lengths[object_id]
+                            norm = self.k1 * (1 - self.b + self.b * length / average_length)
+                            score = weight * idf * frequency * (self.k1 + 1) / (frequency + norm)
+                            if score > word_scores.get(object_id, 0.0):
+                                word_scores[object_id] = score
+                    if scores is None:
+                        scores = word_scores
+                    else:
+                        scores = {
+                            object_id: scores[object_id] + score
+                            for object_id, score in word_scores.items() if object_id in scores
+                        }
+                    if not scores:
+                        break
+            ranked = heapq.nlargest(hits_per_page, scores.items(), key=lambda item: (item[1], item[0]))
+            hits = [dict(self._records[object_id]) for object_id, _ in ranked]
+        return {
+            "hits": hits,
+            "nbHits": len(scores),
+            "query": query,
+            "processingTimeMS": int((time.perf_counter() - started) * 1000),
+        }
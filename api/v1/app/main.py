@@ -1,3 +1,4 @@
+import hmac
 from typing import Optional
 
 from cassandra.cqlengine.management import sync_table
@@ -8,13 +9,22 @@ from fastapi.responses import HTMLResponse
 
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from api.v1.app.shortcuts import render_template, redirect_to, is_htmx
-from api.v1.app.search_client import update_index, search_index
+from api.v1.app.search_client import update_index, search_index_async
 
-from . import database, shortcuts, oauth2
+from . import config, database, security, shortcuts, oauth2, search_client
+from .ingest import watch_event_buffer
 from .exceptions import HandleExceptions
-from .models import User, Video, WatchEvent, Playlist
+from .models import (
+    video_cache, User, UserById, Video, WatchEvent, ResumePosition, Playlist, PlaylistItem,
+    SearchOutbox, SearchCheckpoint, SearchLease
+)
+from .indexer import search_indexer
+from .fragments import fragment_cache
+from .decorators import anonymous_cache, page_cache, page_flights
 from .routers import users, auth, videos, watch_event, playlist
 
+settings = config.get_settings()
+
 DB_SESSION = None
 
 
@@ -54,14 +64,34 @@ async def http_exception_handler(request, exc):
 
 
 @app.on_event("startup")
-def on_startup():
+async def on_startup():
     global DB_SESSION
+    shortcuts.precompile_templates()
     DB_SESSION = database.get_session()
-    database.get_session()
     sync_table(User)
+    sync_table(UserById)
     sync_table(Video)
     sync_table(WatchEvent)
+    sync_table(ResumePosition)
     sync_table(Playlist)
+    sync_table(PlaylistItem)
+    sync_table(SearchOutbox)
+    sync_table(SearchCheckpoint)
+    sync_table(SearchLease)
+    database.prepare_statements(DB_SESSION)
+    watch_event_buffer.start()
+    if search_client.is_local():
+        search_client.start_local_index()
+    if settings.search_indexer_enabled and search_client.is_configured():
+        search_indexer.start()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await watch_event_buffer.stop()
+    await search_indexer.stop()
+    security.shutdown()
+    await search_client.close()
 
 
 app.include_router(users.router)
@@ -72,19 +102,20 @@ app.include_router(playlist.router)
 
 
 @app.get("/", response_class=HTMLResponse)
-def root(request: Request):
+@anonymous_cache
+async def root(request: Request):
     if request.user.is_authenticated:
         return shortcuts.render_template(request, "dashboard.html", {})
     return shortcuts.render_template(request, "home.html", {})
 
 
 @app.get("/api/search", response_class=HTMLResponse)
-def search_for_content(request: Request, q: Optional[str] = None):
+async def search_for_content(request: Request, q: Optional[str] = None):
     qry = None
     context = {}
     if q:
         qry = q
-        results = search_index(qry)
+        results = await search_index_async(qry)
         context = {
             "hits": results.get("hits"),
             "num_hits": results.get("nbHits"),
@@ -93,7 +124,34 @@ def search_for_content(request: Request, q: Optional[str] = None):
     return render_template(request, "search/details.html", context)
 
 
+@app.get("/api/metrics")
+def get_metrics(request: Request):
+    """
+    Returns cache, statement and background task counters for internal monitoring.
+
+    The endpoint only exists when settings.metrics_token is set, and requests must send it as
+    ``Authorization: Bearer <token>``.
+    """
+    if not settings.metrics_token:
+        raise StarletteHTTPException(status_code=404)
+    expected = f"Bearer {settings.metrics_token}".encode()
+    if not hmac.compare_digest(request.headers.get("authorization", "").encode(), expected):
+        raise StarletteHTTPException(status_code=401)
+    return {
+        "video_cache": video_cache.stats(),
+        "fragment_cache": fragment_cache.stats(),
+        "page_cache": page_cache.stats(),
+        "page_flights": page_flights.stats(),
+        "search_cache": search_client.search_cache.stats(),
+        "search_backend": {"name": settings.search_backend, "local_records": len(search_client.local_index)},
+        "statements": database.statement_stats(),
+        "watch_event_buffer": {"pending": len(watch_event_buffer)},
+        "search_indexer": search_indexer.stats(),
+    }
+
+
 @app.post("/api/update-index", response_class=HTMLResponse)
-def update_search_index(request: Request):
-    count = update_index()
+async def update_search_index(request: Request):
+    async with search_indexer.paused():
+        count = await update_index()
     return HTMLResponse(f"{count} Refreshed")
@@ -1,17 +1,25 @@
+import asyncio
+import time
 import uuid
+from collections import Counter
 from datetime import datetime
 
 from cassandra.cqlengine.models import Model
 from cassandra.cqlengine import columns
-from . import config, security, extractors
+from cassandra.util import datetime_from_uuid1, unix_time_from_uuid1
+from . import config, database, security, extractors
 from .exceptions import (
-    InvalidUserExceptions, VideoExistException, InvalidYoutubeVideoURLException
+    InvalidUserExceptions, VideoExistException, InvalidYoutubeVideoURLException,
+    PlaylistNotFoundException
 )
-from cassandra.cqlengine.query import DoesNotExist, MultipleObjectsReturned
 from api.v1.app.shortcuts import templates
+from api.v1.app.fragments import render_cached, invalidate_fragments
+from api.v1.app.cache import TTLCache, MISSING
 
 settings = config.get_settings()
 
+video_cache = TTLCache(maxsize=settings.video_cache_size, ttl=settings.video_cache_ttl)
+
 
 class User(Model):
     __keyspace__ = settings.keyspace
@@ -29,7 +37,7 @@ class User(Model):
         return f"User(email={self.email}, user_id={self.user_id}, password={self.password})"
 
     @staticmethod
-    def create_user(email, firstname, lastname, password):
+    async def create_user(email, firstname, lastname, password):
         """
         Creates a new User instance and saves it to the database.
 
@@ -47,14 +55,14 @@ class User(Model):
             email=email,
             firstname=firstname,
             lastname=lastname,
-            password=security.hashed(password)
+            password=await security.hashed_async(password)
         )
-        print(obj.password)
-        obj.save()
+        obj.validate()
+        await asyncio.gather(database.save(obj), database.save(UserById.from_user(obj)))
         return obj
 
     @staticmethod
-    def check_user_exists(user_id):
+    async def check_user_exists(user_id):
         """
         Checks if a user with the specified user ID exists in the database.
 
@@ -65,10 +73,10 @@ class User(Model):
             bool: True if the user exists, False otherwise.
 
         """
-        return User.objects.filter(user_id=user_id).allow_filtering() is not None
+        return await User.check_user_by_id(user_id) is not None
 
     @staticmethod
-    def check_user_by_id(user_id=None):
+    async def check_user_by_id(user_id=None):
         """
         Retrieves a user by their ID.
 
@@ -82,7 +90,61 @@ class User(Model):
         if user_id is None:
             return None
 
-        return User.objects.filter(user_id=user_id).allow_filtering().first()
+        obj = await database.first(UserById, user_id=user_id)
+        if obj is None:
+            return None
+        return obj.as_user()
+
+
+class UserById(Model):
+    """
+    Copy of `User` partitioned by `user_id`, so users can be looked up by ID with a single
+    partition read. Written alongside every `User` row.
+    """
+    __keyspace__ = settings.keyspace
+    __table_name__ = "users_by_id"
+    user_id = columns.UUID(primary_key=True)
+    email = columns.Text()
+    firstname = columns.Text()
+    lastname = columns.Text()
+    password = columns.Text()
+    created_at = columns.DateTime()
+
+    @staticmethod
+    def from_user(user):
+        return UserById(
+            user_id=user.user_id,
+            email=user.email,
+            firstname=user.firstname,
+            lastname=user.lastname,
+            password=user.password,
+            created_at=user.created_at
+        )
+
+    def as_user(self):
+        return User(
+            email=self.email,
+            user_id=self.user_id,
+            firstname=self.firstname,
+            lastname=self.lastname,
+            password=self.password,
+            created_at=self.created_at
+        )
+
+    @staticmethod
+    async def backfill():
+        """
+        Writes a `users_by_id` row for every existing user.
+
+        Returns:
+            int: The number of users written.
+
+        """
+        users = await database.fetch_all(User)
+        for start in range(0, len(users), 100):
+            chunk = users[start:start + 100]
+            await asyncio.gather(*(database.save(UserById.from_user(user)) for user in chunk))
+        return len(users)
 
 
 class Video(Model):
@@ -113,21 +175,142 @@ class Video(Model):
         context = {
             "host_id": self.host_id
         }
-        t = templates.get_template(template)
-        return t.render(context)
+        return render_cached(templates.env, template, context, tag=self.host_id)
+
+    async def update_video_url(self, url, save=True):
+        """
+        Points the video at a new URL, moving it to the new host ID if the URL changed it.
+
+        Video rows are created with `IF NOT EXISTS`, so every write to them goes through a
+        lightweight transaction too: an edit that keeps the host ID is an `UPDATE ... IF EXISTS`,
+        and a move registers the new host ID the same way `register` does before deleting the
+        old row with `IF EXISTS`.
 
-    def update_video_url(self, url, save=True):
+        Args:
+            url (str): The new URL of the video.
+            save (bool): Whether to write the change.
+
+        Returns:
+            str: The URL, or None if it is not a valid YouTube video URL.
+
+        Raises:
+            VideoExistException: If another video already has the new host ID.
+
+        """
         host_id = extractors.extract_video_id(url)
-        if host_id:
+        if not host_id:
+            return None
+        old_host_id = self.host_id
+        if not save:
             self.url = url
             self.host_id = host_id
-            if save:
-                self.save()
             return url
-        return None
+        # Recorded ahead of the conditional writes, which cannot share a batch with the outbox.
+        await SearchOutbox.record("video", old_host_id, host_id)
+        if host_id == old_host_id:
+            await database.update(self, if_exists=True, url=url, title=self.title)
+        else:
+            video, created = await Video.register(
+                host_id, url=url, user_id=self.user_id, title=self.title, recorded=True
+            )
+            if not created:
+                raise VideoExistException("Video already exists")
+            await database.delete(self, if_exists=True)
+            self.host_id, self.db_id, self.url = video.host_id, video.db_id, video.url
+        Video.invalidate(old_host_id)
+        Video.invalidate(host_id)
+        return url
+
+    async def remove(self):
+        await SearchOutbox.record("video", self.host_id)
+        await database.delete(self, if_exists=True)
+        Video.invalidate(self.host_id)
+
+    @staticmethod
+    def invalidate(host_id):
+        """
+        Drops the cached row and every cached fragment rendered for a host ID.
+        """
+        video_cache.delete(host_id)
+        invalidate_fragments(host_id, f"/api/video/{host_id}")
+
+    @staticmethod
+    async def get_cached(host_id):
+        """
+        Fetches a video by host ID through the read-through video cache.
+
+        Misses are cached for `video_cache_negative_ttl` seconds, so repeated requests for
+        unknown IDs do not reach the database.
+
+        Args:
+            host_id (str): The video's host ID.
+
+        Returns:
+            Video: The matching video.
+
+        Raises:
+            Video.DoesNotExist: If no video has this host ID.
+            Video.MultipleObjectsReturned: If more than one row has this host ID.
+
+        """
+        values = video_cache.get(host_id)
+        if values is None:
+            raise Video.DoesNotExist("Video matching query does not exist")
+        if values is not MISSING:
+            return Video._construct_instance(values)
+        try:
+            video = await database.get(Video, host_id=host_id)
+        except Video.DoesNotExist:
+            video_cache.set(host_id, None, ttl=settings.video_cache_negative_ttl)
+            raise
+        video_cache.set(host_id, video._as_dict())
+        return video
+
+    @staticmethod
+    def db_id_for(host_id, host_service="youtube"):
+        return uuid.uuid5(uuid.NAMESPACE_URL, f"{host_service}:{host_id}")
+
+    @staticmethod
+    async def register(host_id, url, user_id=None, title=None, checked=False, recorded=False):
+        """
+        Registers a video with a conditional insert.
+
+        The row's `db_id` is derived from the host ID, so every request registering the same
+        video targets the same primary key and `IF NOT EXISTS` lets exactly one of them win.
+        Rows written before `db_id` was derived have a random `db_id` that the insert would
+        never conflict with, so the host ID is read first and an existing row of either kind
+        is returned as is.
+
+        Args:
+            host_id (str): The video's host ID.
+            url (str): The URL of the video.
+            user_id (UUID): The ID of the user registering the video.
+            title (str): The title of the video.
+            checked (bool): Whether the caller has just read the host ID and found no row, in
+                which case the read is skipped.
+            recorded (bool): Whether the caller has already recorded the host ID in the search
+                outbox.
+
+        Returns:
+            tuple: The winning Video and whether this call created it.
+
+        """
+        if not checked:
+            existing = await database.first(Video, host_id=host_id)
+            if existing is not None:
+                return existing, False
+        if not recorded:
+            # Conditional inserts cannot share a batch with the outbox, so the change is
+            # recorded first; if another request wins, the indexer just re-reads its row.
+            await SearchOutbox.record("video", host_id)
+        video = Video(host_id=host_id, db_id=Video.db_id_for(host_id), user_id=user_id, url=url, title=title)
+        video, created = await database.save_if_not_exists(video)
+        if created:
+            Video.invalidate(host_id)
+        return video, created
 
     @staticmethod
-    def add_video(url, user_id=None, title=None):
+    async def add_video(url, user_id=None, title=None):
         """
         Adds a video to the database.
 
@@ -147,28 +330,21 @@ class Video(Model):
         host_id = extractors.extract_video_id(url)
         if host_id is None:
             raise InvalidYoutubeVideoURLException("Invalid Youtube Video URL")
-        if User.check_user_exists(user_id) is None:
+        # The owner is checked before anything is written, so no request can see a video whose
+        # owner does not exist; the check is a single-partition read of `users_by_id`.
+        if not await User.check_user_exists(user_id):
             raise InvalidUserExceptions("User not found")
-        qry = Video.objects.filter(host_id=host_id).allow_filtering().first()
-        if qry is not None:
+        video, created = await Video.register(host_id, url=url, user_id=user_id, title=title)
+        if not created:
             raise VideoExistException("Video already exists")
-        return Video.create(host_id=host_id, user_id=user_id, url=url, title=title)
+        return video
 
     @staticmethod
-    def get_or_create(user_id, url, title):
-        obj = None
-        created = False
+    async def get_or_create(user_id, url, title):
         host_id = extractors.extract_video_id(url)
-        try:
-            obj = Video.objects.get(host_id=host_id)
-        except DoesNotExist:
-            obj = Video.add_video(user_id=user_id, url=url, title=title)
-            created = True
-        except MultipleObjectsReturned:
-            obj = Video.objects.filter(host_id=host_id).allow_filtering().first()
-        except Exception as e:
-            raise Exception(e)
-        return obj, created
+        if host_id is None:
+            raise InvalidYoutubeVideoURLException("Invalid Youtube Video URL")
+        return await Video.register(host_id, url=url, user_id=user_id, title=title)
 
 
 class WatchEvent(Model):
@@ -193,15 +369,94 @@ class WatchEvent(Model):
         return self.duration * 0.98 < self.end_time
 
     @staticmethod
-    def get_resume_time(host_id, user_id):
-        resume_time = 0
-        qry_obj = WatchEvent.objects.filter(host_id=host_id, user_id=user_id).allow_filtering().first()
+    async def get_resume_time(host_id, user_id):
+        qry_obj = await database.first(ResumePosition, user_id=user_id, host_id=host_id)
+        if qry_obj is None:
+            return 0
+        return qry_obj.resume_time
+
+
+class ResumePosition(Model):
+    """
+    Latest playback position per (user_id, host_id), kept alongside `WatchEvent` so resuming a
+    video is a single-row primary key read instead of a filtered scan of the video's events.
+    """
+    __keyspace__ = settings.keyspace
+    user_id = columns.UUID(primary_key=True)
+    host_id = columns.Text(primary_key=True)
+    end_time = columns.Double()
+    duration = columns.Double()
+    complete = columns.Boolean(default=False)
+    updated = columns.DateTime()
 
-        if qry_obj is not None:
-            if not qry_obj.complete or not qry_obj.is_completed:
-                resume_time = qry_obj.end_time
+    @property
+    def is_completed(self):
+        return self.duration * 0.98 < self.end_time
+
+    @property
+    def resume_time(self):
+        if not self.complete or not self.is_completed:
+            return self.end_time
+        return 0
+
+    @staticmethod
+    def from_event(data):
+        """
+        Builds the resume position recorded by a watch event.
 
-        return resume_time
+        Args:
+            data (dict): The watch event fields, including `host_id` and `user_id`.
+
+        Returns:
+            ResumePosition: The position to upsert.
+
+        """
+        return ResumePosition(
+            user_id=data.get("user_id"),
+            host_id=data.get("host_id"),
+            end_time=data.get("end_time"),
+            duration=data.get("duration"),
+            complete=data.get("complete"),
+            updated=datetime.utcnow()
+        )
+
+    @staticmethod
+    async def backfill():
+        """
+        Writes the resume position of every user and video from their latest legacy watch event.
+
+        Each row is written with the event's time as its write timestamp, so a position recorded
+        by a newer event, including one written while the backfill runs, is never overwritten.
+
+        Returns:
+            int: The number of resume positions written.
+
+        """
+        chunk = []
+        count = 0
+        host_id = None
+        seen = set()
+
+        async def write(event):
+            position = ResumePosition.from_event(event._as_dict())
+            position.updated = datetime_from_uuid1(event.event_id)
+            await database.save(position, timestamp=unix_time_from_uuid1(event.event_id) * 1e6)
+
+        # Events are clustered newest first within each video's partition, so the first event
+        # seen for a user in a partition is their latest one for that video.
+        async for event in database.RowStream(WatchEvent, page_size=settings.max_page_size, max_pages=None):
+            if event.host_id != host_id:
+                host_id, seen = event.host_id, set()
+            if event.user_id in seen:
+                continue
+            seen.add(event.user_id)
+            chunk.append(event)
+            if len(chunk) >= settings.db_max_concurrency:
+                await asyncio.gather(*(write(event) for event in chunk))
+                count += len(chunk)
+                chunk = []
+        await asyncio.gather(*(write(event) for event in chunk))
+        return count + len(chunk)
 
 
 class Playlist(Model):
@@ -209,6 +464,7 @@ class Playlist(Model):
     db_id = columns.UUID(primary_key=True, default=uuid.uuid1)
     user_id = columns.UUID()
     updated = columns.DateTime(default=datetime.utcnow())
+    # Legacy storage, superseded by `PlaylistItem`; copied over by `backfill_items`.
     host_ids = columns.List(value_type=columns.Text)
     title = columns.Text()
 
@@ -216,24 +472,304 @@ class Playlist(Model):
     def path(self):
         return f"/api/playlist/{self.db_id}"
 
-    def add_host_ids(self, host_ids=None, replace_all=False):
-        if not isinstance(host_ids, list):
-            return False
-        if replace_all:
-            self.host_ids = host_ids
+    @staticmethod
+    async def create(**data):
+        playlist = Playlist(**data)
+        await database.save_batch([playlist, *SearchOutbox.changes("playlist", playlist.db_id)], logged=True)
+        return playlist
+
+    def _touched(self):
+        # `playlist_items` rows share the playlist's partition key value, so the timestamp
+        # update rides in the same single-replica-set batch as the item writes.
+        return [(self, {"updated": datetime.utcnow()})]
+
+    async def append_videos(self, host_ids):
+        """
+        Appends videos to the end of the playlist without reading the existing items.
+
+        The items and the playlist's `updated` timestamp are written in a single batch.
+
+        Args:
+            host_ids (list): The host IDs of the videos to append.
+
+        Returns:
+            list: The created PlaylistItem instances.
+
+        """
+        start = time.time()
+        items = [
+            PlaylistItem(playlist_id=self.db_id, position=start + index * 1e-6, host_id=host_id)
+            for index, host_id in enumerate(host_ids)
+        ]
+        await database.save_batch(items, updates=self._touched())
+        return items
+
+    @staticmethod
+    async def add_video_from_url(db_id, url, user_id=None, title=None):
+        """
+        Adds a video to a playlist, registering the video first if it is new.
+
+        The host ID comes from the URL, so nothing written depends on anything read: the playlist
+        and the video are read concurrently, then the video (only if it is new, through
+        `Video.register`) and the batch holding the playlist entry and timestamp are written
+        concurrently. Adding a known video costs two reads and one write; a new video adds the
+        conditional insert and its search outbox entry.
+
+        Args:
+            db_id (UUID): The playlist's ID.
+            url (str): The URL of the video.
+            user_id (UUID): The ID of the user adding the video.
+            title (str): The title used if the video is new.
+
+        Returns:
+            Video: The existing or newly registered video.
+
+        Raises:
+            InvalidYoutubeVideoURLException: If the URL is not a valid YouTube video URL.
+            PlaylistNotFoundException: If the playlist does not exist.
+
+        """
+        host_id = extractors.extract_video_id(url)
+        if host_id is None:
+            raise InvalidYoutubeVideoURLException("Invalid Youtube Video URL")
+        playlist, video = await asyncio.gather(
+            database.first(Playlist, db_id=db_id),
+            database.first(Video, host_id=host_id)
+        )
+        if playlist is None:
+            raise PlaylistNotFoundException("Playlist not found")
+        if video is None:
+            (video, created), items = await asyncio.gather(
+                Video.register(host_id, url=url, user_id=user_id, title=title, checked=True),
+                playlist.append_videos([host_id])
+            )
         else:
-            self.host_ids += host_ids
-        self.updated = datetime.utcnow()
-        self.save()
-        return True
-
-    def get_videos(self):
-        videos = []
-        for host_id in self.host_ids:
-            try:
-                vid_obj = Video.objects.get(host_id=host_id)
-            except Exception as e:
-                vid_obj = None
-            if vid_obj is not None:
-                videos.append(vid_obj)
-        return videos
+            await playlist.append_videos([host_id])
+        return video
+
+    async def remove_item(self, position, item_id):
+        """
+        Removes a single entry from the playlist.
+
+        Args:
+            position (float): The entry's position.
+            item_id (UUID): The entry's item ID.
+
+        """
+        item = PlaylistItem(playlist_id=self.db_id, position=position, item_id=item_id)
+        await database.save_batch([], deletes=[item], updates=self._touched())
+
+    async def move_item(self, position, item_id, host_id, after=None, before=None):
+        """
+        Moves a single entry between two neighbouring positions.
+
+        The entry is re-written at the midpoint of its new neighbours and deleted from its old
+        position in one batch, so no other entry is touched.
+
+        Args:
+            position (float): The entry's current position.
+            item_id (UUID): The entry's item ID.
+            host_id (str): The entry's video host ID.
+            after (float): The position of the entry it should follow, or None to move it first.
+            before (float): The position of the entry it should precede, or None to move it last.
+
+        Returns:
+            PlaylistItem: The entry at its new position.
+
+        """
+        old_item = PlaylistItem(playlist_id=self.db_id, position=position, item_id=item_id)
+        new_item = PlaylistItem(
+            playlist_id=self.db_id, position=PlaylistItem.position_between(after, before),
+            item_id=item_id, host_id=host_id
+        )
+        await database.save_batch([new_item], deletes=[old_item], updates=self._touched())
+        return new_item
+
+    async def get_videos(self, cursor=None, page_size=None):
+        """
+        Fetches one page of the playlist's entries and their videos.
+
+        Args:
+            cursor (str): The cursor returned with the previous page, if any.
+            page_size (int): The number of entries per page.
+
+        Returns:
+            tuple: A list of (PlaylistItem, Video) pairs in playlist order and the cursor of the
+            next page, or None on the last page. Entries whose video no longer exists are skipped.
+
+        Raises:
+            InvalidCursorException: If the cursor cannot be decoded.
+
+        """
+        items, next_cursor = await database.fetch_page(
+            PlaylistItem, cursor=cursor, page_size=page_size, playlist_id=self.db_id
+        )
+        by_host_id = {}
+        if items:
+            for vid_obj in await database.fetch_in(Video, "host_id", [item.host_id for item in items]):
+                by_host_id.setdefault(vid_obj.host_id, vid_obj)
+        entries = [(item, by_host_id[item.host_id]) for item in items if item.host_id in by_host_id]
+        return entries, next_cursor
+
+    @staticmethod
+    async def backfill_items():
+        """
+        Copies the legacy `host_ids` list of every playlist into `playlist_items`.
+
+        Entries added since `playlist_items` was introduced are kept: only legacy host IDs
+        without a matching item are written, ahead of the existing items and in their legacy
+        order, so the backfill can be re-run safely.
+
+        Returns:
+            int: The number of playlists that received items.
+
+        """
+        count = 0
+        for playlist in await database.fetch_all(Playlist):
+            if not playlist.host_ids:
+                continue
+            existing = [item async for item in database.RowStream(
+                PlaylistItem, max_pages=None, playlist_id=playlist.db_id
+            )]
+            present = Counter(item.host_id for item in existing)
+            missing = []
+            for host_id in playlist.host_ids:
+                if present[host_id]:
+                    present[host_id] -= 1
+                else:
+                    missing.append(host_id)
+            if not missing:
+                continue
+            start = min(item.position for item in existing) if existing else 0.0
+            items = [
+                PlaylistItem(playlist_id=playlist.db_id, host_id=host_id,
+                             position=start - PlaylistItem.POSITION_STEP * (len(missing) - index))
+                for index, host_id in enumerate(missing)
+            ]
+            for offset in range(0, len(items), PlaylistItem.BATCH_SIZE):
+                await database.save_batch(items[offset:offset + PlaylistItem.BATCH_SIZE])
+            count += 1
+        return count
+
+
+class PlaylistItem(Model):
+    """
+    One entry of a playlist, clustered by position so that appending, removing or moving an
+    entry writes a single row.
+
+    Positions are sparse floats: appends use the current timestamp, and an entry moved between
+    two others takes the midpoint of their positions. `item_id` keeps entries that land on the
+    same position apart.
+    """
+    __keyspace__ = settings.keyspace
+    __table_name__ = "playlist_items"
+    POSITION_STEP = 1024.0
+    POSITION_EPSILON = 1e-3
+    BATCH_SIZE = 50
+    playlist_id = columns.UUID(primary_key=True)
+    position = columns.Double(primary_key=True)
+    item_id = columns.TimeUUID(primary_key=True, default=uuid.uuid1)
+    host_id = columns.Text()
+
+    @staticmethod
+    def position_between(after=None, before=None):
+        if before is None:
+            # Appends are positioned at the current time, so an entry moved to the end must not
+            # be placed further ahead or later appends would sort before it.
+            return max(time.time(), after or 0.0) + PlaylistItem.POSITION_EPSILON
+        if after is None:
+            return before - PlaylistItem.POSITION_STEP
+        return (after + before) / 2
+
+
+class SearchOutbox(Model):
+    """
+    Search index changes waiting to be pushed, one row per changed object.
+
+    Rows only say which object changed; the indexer reads the object's current row when it drains
+    the outbox and updates or deletes its index record accordingly, so changes recorded out of
+    order still converge. Rows are spread over `search_outbox_shards` partitions and clustered
+    by time. Rows expire after `search_outbox_ttl` seconds, since with the local search backend
+    every process reads the outbox and none deletes from it.
+    """
+    __keyspace__ = settings.keyspace
+    __table_name__ = "search_outbox"
+    __options__ = {"default_time_to_live": settings.search_outbox_ttl}
+    shard = columns.Integer(primary_key=True)
+    change_id = columns.TimeUUID(primary_key=True, clustering_order="ASC", default=uuid.uuid1)
+    object_type = columns.Text()
+    object_id = columns.Text()
+
+    @staticmethod
+    def shard_for(object_id):
+        return uuid.uuid5(uuid.NAMESPACE_OID, str(object_id)).int % settings.search_outbox_shards
+
+    @staticmethod
+    def changes(object_type, *object_ids):
+        """
+        Builds the outbox rows recording that objects changed, for callers that write them in
+        the same logged batch as the change itself.
+
+        Args:
+            object_type (str): "video" or "playlist".
+            *object_ids: The host IDs of the videos or the IDs of the playlists.
+
+        Returns:
+            list: Unsaved SearchOutbox instances.
+
+        """
+        return [
+            SearchOutbox(shard=SearchOutbox.shard_for(object_id), object_type=object_type, object_id=object_id)
+            for object_id in dict.fromkeys(str(object_id) for object_id in object_ids)
+        ]
+
+    @staticmethod
+    async def record(object_type, *object_ids):
+        """
+        Records that objects changed, one UNLOGGED batch per outbox partition.
+
+        Used ahead of conditional writes, which cannot share a batch with other tables. An
+        entry for a change that then does not apply only makes the indexer re-read the
+        object's current row.
+
+        Args:
+            object_type (str): "video" or "playlist".
+            *object_ids: The host IDs of the videos or the IDs of the playlists.
+
+        """
+        by_shard = {}
+        for change in SearchOutbox.changes(object_type, *object_ids):
+            by_shard.setdefault(change.shard, []).append(change)
+        await asyncio.gather(*(database.save_batch(changes) for changes in by_shard.values()))
+
+
+class SearchCheckpoint(Model):
+    """
+    The last outbox change pushed to the search index, per outbox shard.
+    """
+    __keyspace__ = settings.keyspace
+    __table_name__ = "search_checkpoint"
+    shard = columns.Integer(primary_key=True)
+    change_id = columns.TimeUUID()
+    updated = columns.DateTime()
+
+
+class SearchLease(Model):
+    """
+    The indexer process currently allowed to drain each outbox shard.
+
+    Rows are written with lightweight transactions and a TTL of `search_indexer_lease_ttl`
+    seconds, so a lease held by a process that died expires on its own.
+    """
+    __keyspace__ = settings.keyspace
+    __table_name__ = "search_lease"
+    shard = columns.Integer(primary_key=True)
+    owner = columns.Text()
+
+
+database.register_statement("user_by_email", User, "email")
+database.register_statement("user_by_id", UserById, "user_id")
+database.register_statement("video_by_host_id", Video, "host_id")
+database.register_statement("resume_position", ResumePosition, "user_id", "host_id")
+database.register_statement("playlist_by_id", Playlist, "db_id")
+database.register_statement("search_checkpoint", SearchCheckpoint, "shard")
@@ -9,7 +9,9 @@ Classes:
 Functions:
 - create_access_token: Generates an access token for a given user.
 - verify_token: Verifies and decodes a JWT token.
+- verify_token_cached: Verifies a JWT token through a cache of decoded payloads.
 - authenticate_user: Authenticates a user based on email and password.
+- rehash_password: Re-hashes a password with the current hashing settings.
 
 Exceptions:
 - credentials_exception: Represents an HTTP 401 Unauthorized exception for credential validation failures.
@@ -23,19 +25,31 @@ from starlette.authentication import (
     AuthCredentials
 )
 
+import asyncio
+import hashlib
+import logging
+import time
+
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
-from fastapi import status, HTTPException
+from fastapi import status, BackgroundTasks, HTTPException
 from api.v1.app.config import get_settings
 from api.v1.app.exceptions import HandleExceptions
-from api.v1.app.models import User
-from api.v1.app import security
+from api.v1.app.models import User, UserById
+from api.v1.app import database, security
+from api.v1.app.cache import TTLCache, MISSING
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
 SECRET_KEY = settings.secret_key
 ALGORITHM = settings.algorithm
 ACCESS_TOKEN_EXPIRE_MINUTES = int(settings.access_token_expire_minutes)
 
+token_cache = TTLCache(maxsize=settings.token_cache_size, ttl=settings.token_cache_max_ttl)
+
+# Holds the rehash tasks started outside a request, so they are not garbage collected mid-run.
+_rehash_tasks = set()
+
 
 credentials_exception = HTTPException(
     status_code=status.HTTP_401_UNAUTHORIZED,
@@ -61,7 +75,9 @@ class JWTCookiePayload(AuthenticationBackend):
 
         """
         session_id = request.cookies.get("session_id")
-        user_data = verify_token(session_id, credentials_exception)
+        if not session_id:
+            return AuthCredentials(["anonymous"]), UnauthenticatedUser()
+        user_data = verify_token_cached(session_id, credentials_exception)
         if not user_data:
             return AuthCredentials(["anonymous"]), UnauthenticatedUser()
         user_id = user_data.get("user_id")
@@ -114,13 +130,48 @@ def verify_token(token: str, credentialsException):
     return payload
 
 
-def authenticate_user(email: str, password: str):
+def verify_token_cached(token: str, credentialsException):
+    """
+    Verifies a JWT token through a cache of decoded payloads.
+
+    Payloads are keyed by a SHA-256 digest of the token and kept until the token's own `exp`,
+    capped at `token_cache_max_ttl`. Tokens that fail verification are remembered for
+    `token_cache_negative_ttl` seconds.
+
+    Args:
+        token: The JWT token string to verify.
+        credentialsException: The exception to raise if the verification fails.
+
+    Returns:
+        dict: The decoded payload of the token if it is valid, otherwise None.
+
+    """
+    key = hashlib.sha256(token.encode()).digest()
+    payload = token_cache.get(key)
+    if payload is not MISSING:
+        return payload
+    payload = verify_token(token, credentialsException)
+    if payload:
+        ttl = min(payload.get("exp", 0) - time.time(), settings.token_cache_max_ttl)
+        if ttl > 0:
+            token_cache.set(key, payload, ttl=ttl)
+    else:
+        token_cache.set(key, None, ttl=settings.token_cache_negative_ttl)
+    return payload
+
+
+async def authenticate_user(email: str, password: str, background_tasks: BackgroundTasks = None):
     """
     Authenticates a user based on their email and password.
 
+    A password hashed with outdated settings is re-hashed after the response is sent, through
+    `background_tasks`, or in a separate task when none are given, so the login does not wait
+    for a second bcrypt run.
+
     Args:
         email: The user's email.
         password: The user's password.
+        background_tasks: The request's background tasks, if any.
 
     Returns:
         User: The authenticated user object.
@@ -129,9 +180,43 @@ def authenticate_user(email: str, password: str):
         HandleExceptions: If the user is not found or the password is incorrect.
 
     """
-    user = User.objects.get(email=email)
+    user = await database.first(User, email=email)
     if not user:
         raise HandleExceptions(status_code=status.HTTP_401_UNAUTHORIZED)
-    if not security.verify(user.password, password):
+    if not await security.verify_async(user.password, password):
         return None
+    if security.needs_update(user.password):
+        if background_tasks is not None:
+            background_tasks.add_task(rehash_password, user, password)
+        else:
+            task = asyncio.create_task(rehash_password(user, password))
+            _rehash_tasks.add(task)
+            task.add_done_callback(_rehash_tasks.discard)
     return user
+
+
+async def rehash_password(user: User, password: str):
+    """
+    Re-hashes a user's password with the current hashing settings after a successful login.
+
+    Failures are logged and ignored, since the existing hash remains valid. The `users_by_id`
+    copy is only updated if it exists, so a user not yet covered by `backfill-users-by-id` does
+    not get a partial row holding only a password; the backfill copies the new hash later.
+
+    Args:
+        user: The authenticated user.
+        password: The password the user just logged in with.
+
+    """
+    try:
+        new_hash = await security.hashed_async(password)
+        results = await asyncio.gather(
+            database.update(user, password=new_hash),
+            database.update(UserById(user_id=user.user_id), if_exists=True, password=new_hash),
+            return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, Exception) and not isinstance(result, UserById.DoesNotExist):
+                raise result
+    except Exception as e:
+        logger.warning("Password rehash failed for %s: %s", user.user_id, e)
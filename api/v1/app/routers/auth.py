@@ -1,10 +1,10 @@
 from typing import Optional
 
-from fastapi import APIRouter, Request, Form
+from fastapi import APIRouter, BackgroundTasks, Request, Form
 from fastapi.responses import HTMLResponse
 from api.v1.app.schemas import UserLogin
 from api.v1.app.shortcuts import render_template, redirect_to
-from api.v1.app.utils import valid_schema_data
+from api.v1.app.utils import valid_schema_data_async
 
 router = APIRouter(tags=["Authentication"], prefix="/api/auth")
 
@@ -16,10 +16,11 @@ async def user_login(request: Request):
 
 @router.post("/token/sign-in", response_class=HTMLResponse)
 async def user_login(
-        request: Request, email: str = Form(...), password: str = Form(...), _next: Optional[str] = "/"
+        request: Request, background_tasks: BackgroundTasks,
+        email: str = Form(...), password: str = Form(...), _next: Optional[str] = "/"
 ):
     rw_data = {"email": email, "password": password}
-    data, errors = valid_schema_data(UserLogin, rw_data)
+    data, errors = await valid_schema_data_async(UserLogin, rw_data, background_tasks=background_tasks)
     if errors:
         return render_template(request, "auth/sign-in.html", {
             "data": data,
@@ -6,11 +6,13 @@ from fastapi.responses import HTMLResponse
 from starlette.exceptions import HTTPException as StarletteHTTPException
 
 from api.v1.app import utils
-from api.v1.app.models import Playlist, WatchEvent
+from api.v1.app.models import Playlist
 from api.v1.app.schemas import PlaylistCreate, PlaylistVideoCreate
-from api.v1.app.decorators import login_required
+from api.v1.app.decorators import login_required, anonymous_cache
+from api.v1.app.exceptions import InvalidCursorException
 from api.v1.app.shortcuts import (
-    render_template, redirect_to, found_object_or_404, is_htmx
+    render_template, redirect_to, found_object_or_404, get_page_or_400, capped_page_size, is_htmx,
+    cache_validators, is_not_modified, not_modified
 )
 
 
@@ -18,11 +20,19 @@ router = APIRouter(tags=["Playlists"], prefix="/api/playlist")
 
 
 @router.get("/", response_class=HTMLResponse)
-async def get_all_playlist(request: Request):
-    qry = Playlist.objects.all()
+@anonymous_cache
+async def get_all_playlist(
+        request: Request, isHTMX=Depends(is_htmx),
+        cursor: Optional[str] = None, page_size: Optional[int] = None
+):
+    qry, next_cursor = await get_page_or_400(Playlist, cursor=cursor, page_size=page_size)
     context = {
-        "playlists": qry
+        "playlists": qry,
+        "next_cursor": next_cursor,
+        "page_size": page_size
     }
+    if isHTMX and cursor:
+        return render_template(request, "playlists/htmx/list-page.html", context)
     return render_template(request, "playlists/list.html", context)
 
 
@@ -43,19 +53,37 @@ async def create_playlist(request: Request, title: str = Form(...)):
     context = {"data": data, "errors": errors}
     if errors:
         return render_template(request, "playlists/create.html", context, status_code=400)
-    obj = Playlist.objects.create(**data)
+    obj = await Playlist.create(**data)
     redirect_path = obj.path or "api/playlist/create"
     return redirect_to(redirect_path)
 
 
 @router.get("/{db_id}", response_class=HTMLResponse)
-async def get_playlist(request: Request, db_id: uuid.UUID):
-    qry = found_object_or_404(Playlist, db_id=db_id)
+@anonymous_cache
+async def get_playlist(
+        request: Request, db_id: uuid.UUID, isHTMX=Depends(is_htmx),
+        cursor: Optional[str] = None, page_size: Optional[int] = None
+):
+    qry = await found_object_or_404(Playlist, db_id=db_id)
+    try:
+        entries, next_cursor = await qry.get_videos(cursor=cursor, page_size=capped_page_size(page_size))
+    except InvalidCursorException:
+        raise StarletteHTTPException(status_code=400)
+    # Video titles are part of the version: editing a video does not touch the playlists holding it,
+    # so `updated` is not a valid Last-Modified for the page and only the ETag is sent.
+    versions = [(item.item_id, item.position, video.host_id, video.title) for item, video in entries]
+    headers = cache_validators(request, qry.title, qry.updated, versions)
+    if is_not_modified(request, headers):
+        return not_modified(headers)
     context = {
         "playlist": qry,
-        "videos": qry.get_videos()
+        "entries": entries,
+        "next_cursor": next_cursor,
+        "page_size": page_size
     }
-    return render_template(request, f"playlists/details.html", context)
+    if isHTMX and cursor:
+        return render_template(request, "playlists/htmx/items-page.html", context, headers=headers)
+    return render_template(request, f"playlists/details.html", context, headers=headers)
 
 
 @router.get("/{db_id}/add-video", response_class=HTMLResponse)
@@ -79,7 +107,7 @@ async def playlist_create_video(
         "title": title,
         "playlist_id": db_id
     }
-    data, errors = utils.valid_schema_data(PlaylistVideoCreate, raw_data)
+    data, errors = await utils.valid_schema_data_async(PlaylistVideoCreate, raw_data)
     redirect_path = data.get('path') or f"/api/playlist/{db_id}"
     if not isHTMX:
         raise StarletteHTTPException(status_code=400)
@@ -94,18 +122,37 @@ async def playlist_create_video(
 async def remove_video_from_playlist(
         request: Request, db_id: uuid.UUID, host_id: str,
         isHTMX: bool = Depends(is_htmx),
-        index: Optional[int] = Form(default=None)
+        position: Optional[float] = Form(default=None),
+        item_id: Optional[uuid.UUID] = Form(default=None)
 ):
     if not isHTMX:
         raise StarletteHTTPException(status_code=400)
     try:
-        qry = found_object_or_404(Playlist, db_id=db_id)
+        qry = await found_object_or_404(Playlist, db_id=db_id)
     except Exception as e:
         return HTMLResponse(f"Error {e}, Please reload the page")
     if not request.user.is_authenticated:
         return HTMLResponse("You must be logged in to carry out this action")
-    if isinstance(index, int):
-        host_id = qry.host_ids
-        host_id.pop(index)
-        qry.add_host_ids(host_ids=host_id, replace_all=True)
+    if position is not None and item_id is not None:
+        await qry.remove_item(position=position, item_id=item_id)
     return HTMLResponse("Deleted")
+
+
+@router.post("/{db_id}/{host_id}/move", response_class=HTMLResponse)
+async def move_video_in_playlist(
+        request: Request, db_id: uuid.UUID, host_id: str,
+        isHTMX: bool = Depends(is_htmx),
+        position: float = Form(...), item_id: uuid.UUID = Form(...),
+        after: Optional[float] = Form(default=None),
+        before: Optional[float] = Form(default=None)
+):
+    if not isHTMX:
+        raise StarletteHTTPException(status_code=400)
+    try:
+        qry = await found_object_or_404(Playlist, db_id=db_id)
+    except Exception as e:
+        return HTMLResponse(f"Error {e}, Please reload the page")
+    if not request.user.is_authenticated:
+        return HTMLResponse("You must be logged in to carry out this action")
+    await qry.move_item(position=position, item_id=item_id, host_id=host_id, after=after, before=before)
+    return HTMLResponse("Moved")
@@ -1,9 +1,12 @@
+from typing import Optional
+
 from fastapi import APIRouter, Request, Form
 from fastapi.responses import HTMLResponse
+from api.v1.app.exceptions import PasswordHashThrottledException
 from api.v1.app.models import User
 from api.v1.app.schemas import UserCreate
-from api.v1.app.shortcuts import render_template, redirect_to
-from api.v1.app.utils import valid_schema_data
+from api.v1.app.shortcuts import render_template, redirect_to, get_page_or_400
+from api.v1.app.utils import valid_schema_data_async
 from api.v1.app.decorators import login_required
 
 
@@ -11,9 +14,9 @@ router = APIRouter(tags=["Users"], prefix="/api/user")
 
 
 @router.get("/")
-async def get_all_users():
-    query = User.objects.all()
-    return list(query)
+async def get_all_users(cursor: Optional[str] = None, page_size: Optional[int] = None):
+    items, next_cursor = await get_page_or_400(User, cursor=cursor, page_size=page_size)
+    return {"items": items, "next_cursor": next_cursor}
 
 
 @router.get("/sign-up", response_class=HTMLResponse)
@@ -31,7 +34,7 @@ async def create_user(
         "email": email, "firstname": firstname, "lastname": lastname,
         "password": password, "confirm_password": confirm_password
     }
-    data, errors = valid_schema_data(UserCreate, rw_data)
+    data, errors = await valid_schema_data_async(UserCreate, rw_data)
     if errors:
         return render_template(request, "auth/sign-up.html", {
             "data": data, "errors": errors
@@ -39,7 +42,14 @@ async def create_user(
     password = data.pop("password")
     data.pop("confirm_password")
     data["password"] = password.get_secret_value()
-    User.create_user(**data)
+    try:
+        await User.create_user(**data)
+    except PasswordHashThrottledException:
+        errors = [{"loc": ["__root__"], "msg": "too many sign-ups in progress, please try again shortly",
+                   "type": "throttled"}]
+        return render_template(request, "auth/sign-up.html", {
+            "data": data, "errors": errors
+        }, status_code=503)
     return redirect_to("/api/auth/token/sign-in")
 
 
@@ -6,23 +6,44 @@ from fastapi.responses import HTMLResponse
 from starlette.exceptions import HTTPException as StarletteHTTPException
 
 from api.v1.app import utils
-from api.v1.app.models import Video, WatchEvent
+from api.v1.app.ingest import watch_event_buffer
+from api.v1.app.models import Video
 from api.v1.app.schemas import VideoCreate, EditVideo
-from api.v1.app.decorators import login_required
+from api.v1.app.decorators import login_required, anonymous_cache
+from api.v1.app.exceptions import VideoExistException
 from api.v1.app.shortcuts import (
-    render_template, redirect_to, found_object_or_404, is_htmx
+    render_template, stream_template, redirect_to, found_object_or_404, get_page_or_400,
+    stream_rows_or_400, is_htmx, cache_validators, is_not_modified, not_modified
 )
 
 router = APIRouter(tags=["Videos"], prefix="/api/video")
 
 
 @router.get("s/", response_class=HTMLResponse)
-async def get_all_videos(request: Request):
-    qry = Video.objects.all()
+async def get_all_videos(
+        request: Request, isHTMX=Depends(is_htmx),
+        cursor: Optional[str] = None, page_size: Optional[int] = None
+):
+    if isHTMX and cursor:
+        return await get_videos_page(request, cursor=cursor, page_size=page_size)
+    # The full page is streamed and left out of the anonymous page cache, which would have to
+    # read it to the end before sending the first byte.
+    context = {
+        "video_list": await stream_rows_or_400(Video, cursor=cursor, page_size=page_size),
+        "page_size": page_size
+    }
+    return stream_template(request, "videos/list.html", context)
+
+
+@anonymous_cache
+async def get_videos_page(request: Request, cursor: str = None, page_size: int = None):
+    qry, next_cursor = await get_page_or_400(Video, cursor=cursor, page_size=page_size)
     context = {
-        "video_list": qry
+        "video_list": qry,
+        "next_cursor": next_cursor,
+        "page_size": page_size
     }
-    return render_template(request, "videos/list.html", context)
+    return render_template(request, "videos/htmx/list-page.html", context)
 
 
 @router.get("/create", response_class=HTMLResponse)
@@ -44,7 +65,7 @@ async def create_video(
         "user_id": request.user.username,
         "title": title
     }
-    data, errors = utils.valid_schema_data(VideoCreate, raw_data)
+    data, errors = await utils.valid_schema_data_async(VideoCreate, raw_data)
     redirect_path = data.get('path') or "/videos/create"
     if isHTMX:
         context = {
@@ -62,24 +83,28 @@ async def create_video(
 
 
 @router.get("/{host_id}", response_class=HTMLResponse)
+@anonymous_cache
 async def get_video(request: Request, host_id: str):
-    qry = found_object_or_404(Video, host_id=host_id)
+    qry = await found_object_or_404(Video, host_id=host_id)
     start_time = 0
     if request.user.is_authenticated:
         user_id = request.user.username
-        start_time = WatchEvent.get_resume_time(host_id=host_id, user_id=user_id)
+        start_time = await watch_event_buffer.get_resume_time(host_id=host_id, user_id=user_id)
+    headers = cache_validators(request, qry._as_dict(), start_time)
+    if is_not_modified(request, headers):
+        return not_modified(headers)
     context = {
         "host_id": host_id,
         "start_time": start_time,
         "video": qry
     }
-    return render_template(request, f"videos/details.html", context)
+    return render_template(request, f"videos/details.html", context, headers=headers)
 
 
 @router.get("/{host_id}/edit", response_class=HTMLResponse)
 @login_required
 async def edit_video(request: Request, host_id: str):
-    qry = found_object_or_404(Video, host_id=host_id)
+    qry = await found_object_or_404(Video, host_id=host_id)
     context = {
         "video": qry
     }
@@ -98,7 +123,7 @@ async def edit_video(
         "title": title
     }
 
-    qry_obj = found_object_or_404(Video, host_id=host_id)
+    qry_obj = await found_object_or_404(Video, host_id=host_id)
     data, errors = utils.valid_schema_data(EditVideo, raw_data)
     context = {
         "video": qry_obj
@@ -106,7 +131,11 @@ async def edit_video(
     if errors:
         return render_template(request, "videos/edit.html", context, status_code=400)
     qry_obj.title = data.get("title") or qry_obj.title
-    qry_obj.update_video_url(url, save=True)
+    try:
+        await qry_obj.update_video_url(url, save=True)
+    except VideoExistException as e:
+        context["errors"] = [{"loc": ("url",), "msg": str(e)}]
+        return render_template(request, "videos/edit.html", context, status_code=400)
     return render_template(request, "videos/edit.html", context)
 
 
@@ -118,7 +147,7 @@ async def hx_edit_video(request: Request, host_id: str, isHTMX=Depends(is_htmx))
     qry = None
     not_found = False
     try:
-        qry = found_object_or_404(Video, host_id=host_id)
+        qry = await found_object_or_404(Video, host_id=host_id)
     except Exception as e:
         not_found = True
     if not_found:
@@ -141,13 +170,13 @@ async def hx_edit_video(
     qry_obj = None
     not_found = False
     try:
-        qry_obj = found_object_or_404(Video, host_id=host_id)
+        qry_obj = await found_object_or_404(Video, host_id=host_id)
     except Exception as e:
         not_found = True
     if not_found:
         return HTMLResponse("Not found, please try again.")
     if delete:
-        qry_obj.delete()
+        await qry_obj.remove()
         return HTMLResponse("Deleted successfully")
     raw_data = {
         "url": url,
@@ -162,5 +191,9 @@ async def hx_edit_video(
     if errors:
         return render_template(request, "videos/htmx/edit.html", context, status_code=400)
     qry_obj.title = data.get("title") or qry_obj.title
-    qry_obj.update_video_url(url, save=True)
+    try:
+        await qry_obj.update_video_url(url, save=True)
+    except VideoExistException as e:
+        context["errors"] = [{"loc": ("url",), "msg": str(e)}]
+        return render_template(request, "videos/htmx/edit.html", context, status_code=400)
     return render_template(request, "videos/htmx/list-inline.html", context)
@@ -1,8 +1,16 @@
-from fastapi import APIRouter, Request
+import json
+from typing import Any, List
 
-from api.v1.app.models import WatchEvent
+from fastapi import APIRouter, Request, Body, HTTPException, WebSocket, WebSocketDisconnect, status
+from pydantic.error_wrappers import ValidationError
+
+from api.v1.app.config import get_settings
+from api.v1.app.exceptions import BufferFullException
+from api.v1.app.ingest import watch_event_buffer
 from api.v1.app.schemas import WatchEvent as watchEventSchema
 
+settings = get_settings()
+
 router = APIRouter(tags=["Watch Events"], prefix="/api/watch")
 
 
@@ -12,6 +20,126 @@ async def watch_events(request: Request, watch_event: watchEventSchema):
     if request.user.is_authenticated:
         qry_data = data.copy()
         qry_data.update({"user_id": request.user.username})
-        WatchEvent.objects.create(**qry_data)
+        try:
+            await watch_event_buffer.add(qry_data.copy())
+        except BufferFullException:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, headers={"Retry-After": "5"})
         return qry_data
     return data
+
+
+@router.post("/events/batch")
+async def watch_events_batch(request: Request, samples: List[Any] = Body(...)):
+    """
+    Accepts a list of watch event samples buffered by the client.
+
+    Each sample is validated on its own, so one bad sample does not reject the rest. Accepted
+    samples go through the watch event buffer, which coalesces them per video and writes them
+    in per-partition batches.
+
+    Returns:
+        dict: The number of accepted samples and a per-sample result the client can use to
+        retry only the samples that were not accepted.
+
+    """
+    if not request.user.is_authenticated:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+    if len(samples) > settings.watch_batch_max_items:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {settings.watch_batch_max_items} samples per batch"
+        )
+    user_id = request.user.username
+    results = []
+    buffer_full = False
+    for index, sample in enumerate(samples):
+        result = {"index": index, "accepted": False, "errors": []}
+        results.append(result)
+        if buffer_full:
+            result["errors"] = [{"loc": ["__root__"], "msg": "server busy, retry later", "type": "retry"}]
+            continue
+        try:
+            data = watchEventSchema.parse_obj(sample).dict()
+        except ValidationError as e:
+            result["errors"] = json.loads(e.json())
+            continue
+        data.update({"user_id": user_id})
+        try:
+            await watch_event_buffer.add(data)
+        except BufferFullException:
+            buffer_full = True
+            result["errors"] = [{"loc": ["__root__"], "msg": "server busy, retry later", "type": "retry"}]
+            continue
+        result["accepted"] = True
+    return {
+        "accepted": sum(1 for result in results if result["accepted"]),
+        "results": results
+    }
+
+
+@router.websocket("/ws")
+async def watch_events_ws(websocket: WebSocket):
+    """
+    Streams playback progress over a single WebSocket connection.
+
+    The session cookie is checked once, when the connection opens. Each frame is a JSON object:
+
+    - ``{"type": "progress", ...}`` carries the `WatchEvent` fields and is handed to the watch
+      event buffer. Nothing is sent back unless the frame is rejected.
+    - ``{"type": "resume", "host_id": ...}`` asks for the current resume position, which is
+      pushed back as ``{"type": "resume", "host_id": ..., "start_time": ...}``.
+
+    Rejected frames, including binary frames, resume frames without a `host_id` and resume
+    lookups that fail on the database, are answered with ``{"type": "error", "errors": [...]}``
+    and the connection stays open.
+    """
+    if not websocket.user.is_authenticated:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+    user_id = websocket.user.username
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            try:
+                frame = json.loads(message["text"]) if message.get("text") is not None else None
+            except ValueError:
+                frame = None
+            frame_type = frame.pop("type", "progress") if isinstance(frame, dict) else None
+            if frame_type == "resume":
+                host_id = frame.get("host_id")
+                if not host_id or not isinstance(host_id, str):
+                    await websocket.send_json({"type": "error", "errors": [
+                        {"loc": ["host_id"], "msg": "field required", "type": "value_error.missing"}
+                    ]})
+                    continue
+                try:
+                    start_time = await watch_event_buffer.get_resume_time(host_id=host_id, user_id=user_id)
+                except Exception:
+                    await websocket.send_json({"type": "error", "errors": [
+                        {"loc": ["__root__"], "msg": "server busy, retry later", "type": "retry"}
+                    ]})
+                    continue
+                await websocket.send_json({"type": "resume", "host_id": host_id, "start_time": start_time})
+                continue
+            if frame_type != "progress":
+                await websocket.send_json({"type": "error", "errors": [
+                    {"loc": ["type"], "msg": "unknown frame type", "type": "value_error"}
+                ]})
+                continue
+            try:
+                data = watchEventSchema.parse_obj(frame).dict()
+            except ValidationError as e:
+                await websocket.send_json({"type": "error", "errors": json.loads(e.json())})
+                continue
+            data.update({"user_id": user_id})
+            try:
+                await watch_event_buffer.add(data)
+            except BufferFullException:
+                await websocket.send_json({"type": "error", "errors": [
+                    {"loc": ["__root__"], "msg": "server busy, retry later", "type": "retry"}
+                ]})
+    except WebSocketDisconnect:
+        pass
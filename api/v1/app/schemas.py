@@ -3,11 +3,12 @@ from typing import Optional, Any
 from pydantic import BaseModel, EmailStr, validator, SecretStr, root_validator
 from pydantic.fields import Field
 
-from api.v1.app import oauth2
+from api.v1.app import database, oauth2
 from api.v1.app.models import User, Video, Playlist
 from api.v1.app.extractors import extract_video_id
 from .exceptions import (
-    InvalidUserExceptions, VideoExistException, InvalidYoutubeVideoURLException
+    InvalidUserExceptions, VideoExistException, InvalidYoutubeVideoURLException,
+    PlaylistNotFoundException, PasswordHashThrottledException
 )
 
 
@@ -27,15 +28,6 @@ class UserCreate(UserBase):
     password: SecretStr
     confirm_password: SecretStr
 
-    @validator("email")
-    def email_is_available(cls, v, values, **kwargs):
-        """
-        Validator to check if the provided email is available (not already used by an existing user).
-        """
-        if User.objects.filter(email=v):
-            raise ValueError(f"User with {v} already exists")
-        return v
-
     @validator('confirm_password')
     def passwords_match(cls, v, values, **kwargs):
         """
@@ -45,6 +37,16 @@ class UserCreate(UserBase):
             raise ValueError('passwords do not match')
         return v
 
+    @classmethod
+    async def validate_async(cls, values):
+        """
+        Async validator to check if the provided email is available (not already used by an existing user).
+        """
+        email = values.get("email")
+        if await database.first(User, email=email) is not None:
+            raise ValueError(f"User with {email} already exists")
+        return values
+
 
 class UserLogin(UserBase):
     """
@@ -54,18 +56,29 @@ class UserLogin(UserBase):
     session_id: str = None
 
     @root_validator
-    def user_exists(cls, values):
+    def credentials_present(cls, values):
         """
-        Root validator to check if the user exists and the provided credentials are correct.
+        Root validator to check that both credentials were provided.
         """
         email = values.get('email') or None
         password = values.get('password') or None
 
         if not email or not password:
             raise ValueError('incorrect credentials')
+        return values
 
-        password = password.get_secret_value()
-        user = oauth2.authenticate_user(email, password)
+    @classmethod
+    async def validate_async(cls, values, background_tasks=None):
+        """
+        Async validator to check if the user exists and the provided credentials are correct.
+
+        A needed password re-hash is added to `background_tasks`, when given.
+        """
+        password = values.get('password').get_secret_value()
+        try:
+            user = await oauth2.authenticate_user(values.get('email'), password, background_tasks)
+        except PasswordHashThrottledException:
+            raise ValueError('too many sign-in attempts, please try again shortly')
 
         if not user:
             raise ValueError('incorrect credentials')
@@ -109,10 +122,10 @@ class VideoCreate(BaseModel):
             raise ValueError(f'{v} is not a valid youtube video url')
         return v
 
-    @root_validator
-    def validate_data(cls, values):
+    @classmethod
+    async def validate_async(cls, values):
         """
-            Root validator to validate the video data.
+            Async validator to validate the video data and add the video.
 
             Args:
                 values (dict): The values of the model attributes.
@@ -130,7 +143,7 @@ class VideoCreate(BaseModel):
         title = values.get('title')
         video_object = None
         try:
-            video_object = Video.add_video(url=url, user_id=user_id, title=title)
+            video_object = await Video.add_video(url=url, user_id=user_id, title=title)
         except InvalidUserExceptions:
             raise ValueError("There is an error with your account, please try again")
         except InvalidYoutubeVideoURLException:
@@ -194,32 +207,10 @@ class PlaylistVideoCreate(BaseModel):
             raise ValueError(f'{v} is not a valid youtube video url')
         return v
 
-    @validator('playlist_id')
-    def validate_playlist_url(cls, v, values, **kwargs):
-        """
-            Validator to check if the provided URL is a valid YouTube video URL.
-
-            Args:
-                v (str): The URL value.
-                values (dict): The values of other fields in the model.
-                **kwargs: Additional arguments.
-
-            Returns:
-                str: The validated URL.
-
-            Raises:
-                ValueError: If the URL is not a valid YouTube video URL.
-
-        """
-        qry = Playlist.objects.filter(db_id=v)
-        if not qry:
-            raise ValueError(f'{v} is not a valid Playlist')
-        return v
-
-    @root_validator
-    def validate_data(cls, values):
+    @classmethod
+    async def validate_async(cls, values):
         """
-            Root validator to validate the video data.
+            Async validator to validate the playlist and video data and add the video to the playlist.
 
             Args:
                 values (dict): The values of the model attributes.
@@ -238,15 +229,17 @@ class PlaylistVideoCreate(BaseModel):
         playlist_id = values.get("playlist_id")
         video_object = None
         try:
-            video_object, created = Video.get_or_create(url=url, user_id=user_id, title=title)
+            video_object = await Playlist.add_video_from_url(
+                db_id=playlist_id, url=url, user_id=user_id, title=title
+            )
+        except PlaylistNotFoundException:
+            raise ValueError(f'{playlist_id} is not a valid Playlist')
+        except InvalidYoutubeVideoURLException:
+            raise ValueError(f"{url} is not a valid youtube video url")
         except Exception as e:
             raise ValueError("There is an error with your request, please try again")
         if not isinstance(video_object, Video):
             raise ValueError("There is an error with your account, please try again")
-        else:
-            playlist_obj = Playlist.objects.get(db_id=playlist_id)
-            playlist_obj.add_host_ids(host_ids=[video_object.host_id])
-            playlist_obj.save()
         return video_object.as_data()
 
 
@@ -1,42 +1,369 @@
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+
 from algoliasearch.search_client import SearchClient
 
-from api.v1.app import config
+from api.v1.app import config, database
+from api.v1.app.cache import TTLCache, MISSING
+from api.v1.app.local_search import LocalSearchIndex
 from api.v1.app.models import Playlist, Video
 from api.v1.app.schemas import VideoIndex, PlaylistIndex
 
 settings = config.get_settings()
 
+logger = logging.getLogger(__name__)
+
 ALGOLIA_INDEX_NAME = settings.algolia_index_name
 ALGOLIA_APP_ID = settings.algolia_app_id
 ALGOLIA_API_KEY = settings.algolia_api_key
 
 
+search_cache = TTLCache(maxsize=settings.search_cache_size, ttl=settings.search_cache_ttl)
+
+_client = None
+_indexes = {}
+_client_lock = threading.Lock()
+
+local_index = LocalSearchIndex(hits_per_page=settings.search_local_hits_per_page)
+local_index_built_at = None
+_local_index_task = None
+
+
+def is_local():
+    return settings.search_backend == "local"
+
+
+def is_configured():
+    """
+    Returns whether a search backend is usable: the local index, or Algolia with an
+    application ID, API key and index name.
+    """
+    return is_local() or bool(ALGOLIA_APP_ID and ALGOLIA_API_KEY and ALGOLIA_INDEX_NAME)
+
+
+def get_client():
+    """
+    Returns the process-wide search client, creating it on first use.
+
+    The client keeps its HTTP sessions open, so requests reuse pooled keep-alive connections
+    instead of opening new ones.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = SearchClient.create(ALGOLIA_APP_ID, ALGOLIA_API_KEY)
+        return _client
+
+
 def get_index(name=ALGOLIA_INDEX_NAME):
-    client = SearchClient.create(ALGOLIA_APP_ID, ALGOLIA_API_KEY)
-    index = client.init_index(name)
+    index = _indexes.get(name)
+    if index is None:
+        index = _indexes.setdefault(name, get_client().init_index(name))
     return index
 
 
-def get_data_set():
-    playlist_qry = [dict(x) for x in Playlist.objects.all()]
-    playlist_data_set = [PlaylistIndex(**x).dict() for x in playlist_qry]
-    video_qry = [dict(x) for x in Video.objects.all()]
-    video_dataset = [VideoIndex(**x).dict() for x in video_qry]
+async def close():
+    """
+    Closes the search client's connections, the next call creating a new client, and stops a
+    local index build still in progress.
+    """
+    global _client, _local_index_task
+    if _local_index_task is not None:
+        _local_index_task.cancel()
+        _local_index_task = None
+    with _client_lock:
+        client, _client = _client, None
+        _indexes.clear()
+    if client is not None:
+        close_async = getattr(client, "close_async", None)
+        if close_async is not None:
+            await close_async()
+        else:
+            client.close()
+
+
+def normalize_query(query):
+    return " ".join(query.lower().split())
+
+
+async def _call_async(index, method, *args):
+    call_async = getattr(index, f"{method}_async", None)
+    if call_async is not None:
+        return await call_async(*args)
+    return await asyncio.get_running_loop().run_in_executor(None, getattr(index, method), *args)
+
 
-    return playlist_data_set + video_dataset
+def video_record(video):
+    return VideoIndex(**video._as_dict()).dict()
 
 
-def update_index():
-    index = get_index()
-    dataset = get_data_set()
-    index_response = index.save_objects(dataset).wait()
+def playlist_record(playlist):
+    return PlaylistIndex(**playlist._as_dict()).dict()
+
+
+async def push_changes(records, deleted_ids):
+    """
+    Applies changed records and deletions to the index.
+
+    Records are sent as partial updates that create missing objects, so fields set elsewhere
+    are kept. The query cache is cleared afterwards.
+
+    Args:
+        records (list): Index records, as built by `video_record` and `playlist_record`.
+        deleted_ids (list): The objectIDs of records to remove.
+
+    """
+    if is_local():
+        local_index.apply(records, deleted_ids)
+    else:
+        index = get_index()
+        if records:
+            await _call_async(index, "partial_update_objects", records, {"createIfNotExists": True})
+        if deleted_ids:
+            await _call_async(index, "delete_objects", list(deleted_ids))
+    search_cache.clear()
+
+
+async def iter_records(page_size=None):
+    """
+    Yields the index record of every playlist and video, reading one page of rows at a time.
+
+    Args:
+        page_size (int): Rows read per query (default: settings.search_reindex_page_size).
+
+    """
+    page_size = page_size or settings.search_reindex_page_size
+    for model, build in ((Playlist, playlist_record), (Video, video_record)):
+        async for obj in database.RowStream(model, page_size=page_size, max_pages=None):
+            yield build(obj)
+
+
+async def iter_batches(records, batch_size):
+    batch = []
+    async for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def upload_batches(index, batches, concurrency):
+    """
+    Saves batches of records to an index with at most `concurrency` uploads in flight.
+
+    Each upload waits until the batch is indexed, so at most `concurrency` batches are held in
+    memory besides the one being filled.
+
+    Returns:
+        int: The number of records saved.
+
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+    uploads = set()
+
+    async def upload(batch):
+        try:
+            await loop.run_in_executor(None, lambda: index.save_objects(batch).wait())
+        finally:
+            semaphore.release()
+
+    count = 0
     try:
-        len_index = len(list(index_response)[0]["objectIDs"])
+        async for batch in batches:
+            await semaphore.acquire()
+            for task in [task for task in uploads if task.done()]:
+                uploads.discard(task)
+                task.result()
+            uploads.add(asyncio.ensure_future(upload(batch)))
+            count += len(batch)
+        await asyncio.gather(*uploads)
+    except BaseException:
+        for task in uploads:
+            task.cancel()
+        raise
+    return count
+
+
+async def update_index(swap=None):
+    """
+    Rebuilds the search index from the database.
+
+    Rows are read page by page, converted to records lazily and uploaded in fixed-size batches
+    with a bounded number of uploads in flight, so memory does not grow with the catalog. In swap
+    mode the records go into a temporary index, which starts from the live index's settings,
+    synonyms and rules, and replaces it with an atomic move once every batch is indexed: searches never see a
+    half-built index, and objects no longer in the database disappear. The temporary index is
+    deleted if the rebuild fails. Otherwise the live index is updated in place.
+
+    Callers rebuilding a shared index hold `search_indexer.paused()` around this call, so no
+    process drains outbox changes into the index being replaced.
+
+    The local backend always builds a new in-process index and swaps it in.
+
+    Args:
+        swap (bool): Whether to build into a temporary index (default: settings.search_reindex_swap).
+
+    Returns:
+        int: The number of records indexed.
+
+    """
+    if is_local():
+        return await _rebuild_local_index()
+    swap = settings.search_reindex_swap if swap is None else swap
+    loop = asyncio.get_running_loop()
+    client = get_client()
+    name = ALGOLIA_INDEX_NAME
+    if swap:
+        name = f"{ALGOLIA_INDEX_NAME}_tmp_{int(time.time())}"
+        if await loop.run_in_executor(None, get_index().exists):
+            await loop.run_in_executor(None, lambda: client.copy_index(
+                ALGOLIA_INDEX_NAME, name, {"scope": ["settings", "synonyms", "rules"]}
+            ).wait())
+    index = client.init_index(name)
+    try:
+        batches = iter_batches(iter_records(), settings.search_reindex_batch_size)
+        count = await upload_batches(index, batches, settings.search_reindex_concurrency)
+        if swap:
+            await loop.run_in_executor(None, lambda: client.move_index(name, ALGOLIA_INDEX_NAME).wait())
+    except BaseException:
+        if swap:
+            await _delete_index(index)
+        raise
+    search_cache.clear()
+    return count
+
+
+async def _delete_index(index):
+    try:
+        await asyncio.get_running_loop().run_in_executor(None, index.delete)
     except Exception as e:
-        len_index = None
-    return len_index
+        logger.warning("Could not delete the temporary search index %s: %s", index.name, e)
+
+
+async def load_local_index():
+    """
+    Loads the in-process index from the shared snapshot, or builds it and writes the snapshot.
+
+    Workers on the same host share settings.search_local_snapshot under a file lock: the first
+    one to start scans the tables and writes the snapshot, and the others load it instead of
+    repeating the scan. A snapshot older than settings.search_local_snapshot_max_age is rebuilt.
+    Changes made since the snapshot was taken are applied by the outbox indexer, which reads the
+    outbox from the snapshot's build time.
+
+    Returns:
+        int: The number of records indexed.
+
+    """
+    global local_index, local_index_built_at
+    loop = asyncio.get_running_loop()
+    path = settings.search_local_snapshot
+    lock = await loop.run_in_executor(None, _lock_snapshot, path)
+    try:
+        snapshot = await loop.run_in_executor(None, _read_snapshot, path) if lock is not None else None
+        if snapshot is None:
+            count = await _rebuild_local_index()
+            if lock is not None:
+                await loop.run_in_executor(None, _write_snapshot, path, local_index_built_at, local_index.records())
+            return count
+        built_at, records = snapshot
+        index = LocalSearchIndex(hits_per_page=settings.search_local_hits_per_page)
+        for record in records:
+            index.upsert(record)
+        local_index, local_index_built_at = index, built_at
+        search_cache.clear()
+        return len(index)
+    finally:
+        if lock is not None:
+            lock.close()
+
+
+def start_local_index():
+    """
+    Loads or builds the in-process index in the background, so startup does not wait for it.
+    Searches return no hits until it is ready.
+    """
+    global _local_index_task
+    _local_index_task = asyncio.create_task(load_local_index())
+    _local_index_task.add_done_callback(_log_local_index_failure)
+
+
+def _log_local_index_failure(task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Local search index build failed: %s", task.exception())
+
+
+def _lock_snapshot(path):
+    try:
+        lock = open(f"{path}.lock", "a")
+    except OSError as e:
+        logger.warning("Search index snapshot disabled, cannot open %s.lock: %s", path, e)
+        return None
+    fcntl.flock(lock, fcntl.LOCK_EX)
+    return lock
+
+
+def _read_snapshot(path):
+    try:
+        if time.time() - path.stat().st_mtime > settings.search_local_snapshot_max_age:
+            return None
+        with open(path) as f:
+            data = json.load(f)
+        return data["built_at"], data["records"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _write_snapshot(path, built_at, records):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump({"built_at": built_at, "records": records}, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning("Could not write the search index snapshot %s: %s", path, e)
+
+
+async def _rebuild_local_index():
+    global local_index, local_index_built_at
+    started = time.time()
+    index = LocalSearchIndex(hits_per_page=settings.search_local_hits_per_page)
+    async for record in iter_records():
+        index.upsert(record)
+    local_index, local_index_built_at = index, started
+    search_cache.clear()
+    return len(index)
+
+
+async def search_index_async(query):
+    """
+    Searches the index without blocking the event loop, through the query cache.
+
+    Queries are normalized (case and whitespace) before the lookup, so variants of a popular
+    search share one cache entry. With the local backend the in-process index is searched
+    directly. Otherwise the client's async transport is used when it is available (it needs
+    aiohttp), and the blocking call runs in the default executor when it is not.
+
+    Args:
+        query (str): The search query.
 
+    Returns:
+        dict: The search response, including `hits` and `nbHits`.
 
-def search_index(query):
-    index = get_index()
-    return index.search(query)
+    """
+    key = normalize_query(query)
+    results = search_cache.get(key)
+    if results is MISSING:
+        if is_local():
+            results = local_index.search(key)
+        else:
+            results = await _call_async(get_index(), "search", key)
+        search_cache.set(key, results)
+    return results
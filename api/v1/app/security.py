@@ -1,7 +1,34 @@
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
 from passlib.context import CryptContext
 
+from .config import get_settings
+from .exceptions import PasswordHashThrottledException
+
+settings = get_settings()
+
+
+def make_context(rounds=None):
+    """
+    Builds the password hashing context.
+
+    When `rounds` is given, new hashes use exactly that bcrypt cost, and hashes made with any
+    other cost are reported by `needs_update` so they can be re-hashed on the next login.
+    """
+    if rounds is None:
+        return CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return CryptContext(
+        schemes=["bcrypt"], deprecated="auto",
+        bcrypt__default_rounds=rounds, bcrypt__min_rounds=rounds, bcrypt__max_rounds=rounds
+    )
+
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = make_context(settings.password_hash_rounds)
+
+_executor = None
+_semaphore = asyncio.Semaphore(settings.password_hash_concurrency)
 
 
 def hashed(password: str):
@@ -32,3 +59,128 @@ def verify(attempted_password, usr_password):
     """
     return pwd_context.verify(usr_password, attempted_password)
 
+
+def needs_update(usr_password):
+    """
+    Checks whether a stored hash was made with different settings than the current ones.
+
+    Args:
+        usr_password: The hashed user password.
+
+    Returns:
+        bool: True if the password should be re-hashed.
+
+    """
+    return pwd_context.needs_update(usr_password)
+
+
+def calibrate(target_ms: float, min_rounds: int = 4, max_rounds: int = 16):
+    """
+    Benchmarks bcrypt on this host and picks the highest cost that stays within a latency target.
+
+    Args:
+        target_ms: The hashing latency to aim for, in milliseconds.
+        min_rounds: The lowest cost considered.
+        max_rounds: The highest cost considered.
+
+    Returns:
+        tuple: The selected rounds and a list of (rounds, milliseconds) measurements.
+
+    """
+    selected = min_rounds
+    measurements = []
+    for rounds in range(min_rounds, max_rounds + 1):
+        context = make_context(rounds)
+        context.hash("calibration")
+        started = time.perf_counter()
+        context.hash("calibration")
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        measurements.append((rounds, elapsed_ms))
+        if elapsed_ms > target_ms:
+            break
+        selected = rounds
+    return selected, measurements
+
+
+def get_executor():
+    """
+    Returns the worker pool used for password hashing, creating it on first use.
+
+    `password_hash_executor` selects a thread pool (bcrypt releases the GIL while hashing) or a
+    process pool, with `password_hash_workers` workers.
+    """
+    global _executor
+    if _executor is None:
+        if settings.password_hash_executor == "process":
+            _executor = ProcessPoolExecutor(max_workers=settings.password_hash_workers)
+        else:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.password_hash_workers, thread_name_prefix="password-hash"
+            )
+    return _executor
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def _run_limited(func, *args):
+    # `asyncio.wait_for` can drop a permit acquired just as the timeout fires, which would
+    # slowly shrink the pool; `asyncio.timeout` cancels the acquire in place, and a permit
+    # that was granted regardless is handed back.
+    acquired = False
+    try:
+        async with asyncio.timeout(settings.password_hash_queue_timeout):
+            acquired = await _semaphore.acquire()
+    except TimeoutError:
+        if acquired:
+            _semaphore.release()
+        raise PasswordHashThrottledException("Too many password checks in progress")
+    try:
+        return await asyncio.get_running_loop().run_in_executor(get_executor(), func, *args)
+    finally:
+        _semaphore.release()
+
+
+async def hashed_async(password: str):
+    """
+    Hashes the provided password on the password hashing pool instead of the event loop.
+
+    At most `password_hash_concurrency` hashes run or wait at once; callers beyond that wait up
+    to `password_hash_queue_timeout` seconds for a slot.
+
+    Args:
+        password: The password to hash.
+
+    Returns:
+        str: The hashed password.
+
+    Raises:
+        PasswordHashThrottledException: If no slot frees up in time.
+
+    """
+    return await _run_limited(hashed, password)
+
+
+async def verify_async(attempted_password, usr_password):
+    """
+    Verifies a password on the password hashing pool instead of the event loop.
+
+    Shares the concurrency limit of `hashed_async`, so a burst of login attempts queues briefly
+    and is then rejected rather than starving other requests.
+
+    Args:
+        attempted_password: The attempted password.
+        usr_password: The hashed user password.
+
+    Returns:
+        bool: True if the passwords match, False otherwise.
+
+    Raises:
+        PasswordHashThrottledException: If no slot frees up in time.
+
+    """
+    return await _run_limited(verify, attempted_password, usr_password)
@@ -3,25 +3,143 @@ This module provides functions for rendering templates and performing redirects
 
 Functions:
 - render_template: Renders a template with the specified context and returns an HTML response.
+- stream_template: Renders a template incrementally and returns a streaming HTML response.
 - redirect_to: Creates a redirect response to the specified URL with optional cookies and session removal.
+- found_object_or_404: Retrieves a single object or raises a 404.
+- capped_page_size: Applies the default and maximum page size to a requested page size.
+- get_page_or_400: Retrieves one cursor-paginated page of objects or raises a 400.
+- stream_rows_or_400: Streams cursor-paginated objects page by page or raises a 400.
+- make_bytecode_cache: Creates the on-disk template bytecode cache, if its directory can be created.
+- make_templates: Creates the Jinja2 templates object backed by the on-disk bytecode cache.
+- make_stream_environment: Creates the async Jinja2 environment used for streaming.
+- precompile_templates: Compiles every template ahead of the first request.
+- cache_validators: Builds the ETag and caching headers for a page.
+- is_not_modified: Checks a request's conditional headers against a page's validators.
+- not_modified: Creates an empty 304 response carrying a page's validators.
 
 """
 
+import hashlib
+import logging
+from functools import lru_cache
 
+from . import database
 from .config import get_settings
+from .exceptions import InvalidCursorException
+from .fragments import FragmentCacheExtension
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse, RedirectResponse
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+from fastapi.responses import HTMLResponse, RedirectResponse, Response, StreamingResponse
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from cassandra.cqlengine.query import DoesNotExist, MultipleObjectsReturned
 from fastapi import Request
 
 settings = get_settings()
 
-templates = Jinja2Templates(directory=str(settings.template_dir))
+logger = logging.getLogger(__name__)
+
+
+def make_bytecode_cache(directory):
+    """
+    Create an on-disk bytecode cache in the given directory, creating the directory if needed.
+
+    Returns:
+        A FileSystemBytecodeCache, or None if the directory cannot be created, in which case
+        templates are compiled in memory only.
+
+    """
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+    except OSError as e:
+        logger.warning("Template bytecode cache disabled, cannot create %s: %s", directory, e)
+        return None
+    return FileSystemBytecodeCache(str(directory))
+
+
+def make_templates(bytecode_cache: bool = True):
+    """
+    Create the Jinja2 templates object, optionally backed by the on-disk bytecode cache.
+
+    The environment has the `{% cache %}` fragment tag enabled.
+
+    Args:
+        bytecode_cache: Whether compiled templates are stored in and loaded from
+            settings.template_cache_dir.
+
+    Returns:
+        A Jinja2Templates instance rooted at settings.template_dir.
+
+    """
+    jinja_templates = Jinja2Templates(directory=str(settings.template_dir))
+    jinja_templates.env.add_extension(FragmentCacheExtension)
+    if bytecode_cache:
+        jinja_templates.env.bytecode_cache = make_bytecode_cache(settings.template_cache_dir)
+    return jinja_templates
+
+
+# The bytecode caches of the shared environments are attached by `precompile_templates` at
+# startup, so importing this module does not touch the filesystem.
+templates = make_templates(bytecode_cache=False)
+
+
+def make_stream_environment(bytecode_cache: bool = True):
+    """
+    Create the async Jinja2 environment used by `stream_template`.
+
+    Async templates compile to different code than the ones in `templates`, so their bytecode
+    is cached in a separate directory.
+
+    Args:
+        bytecode_cache: Whether compiled templates are stored in and loaded from
+            settings.template_cache_dir / "async".
+
+    Returns:
+        A jinja2.Environment with async rendering enabled.
+
+    """
+    return Environment(
+        loader=FileSystemLoader(str(settings.template_dir)),
+        autoescape=True,
+        enable_async=True,
+        extensions=[FragmentCacheExtension],
+        bytecode_cache=make_bytecode_cache(settings.template_cache_dir / "async") if bytecode_cache else None
+    )
+
+
+stream_env = make_stream_environment(bytecode_cache=False)
+
+
+def precompile_templates(*envs):
+    """
+    Compile every template under settings.template_dir so no request pays the compile cost.
+
+    Templates are loaded into each environment's template cache and written to the bytecode
+    cache, so later workers only unmarshal them. When warming up the shared environments, their
+    bytecode caches are attached first.
+
+    Args:
+        *envs: The Jinja2 environments to warm up (default: `templates.env` and `stream_env`).
+
+    Returns:
+        The number of templates compiled per environment.
+
+    """
+    if not envs:
+        if templates.env.bytecode_cache is None:
+            templates.env.bytecode_cache = make_bytecode_cache(settings.template_cache_dir)
+        if stream_env.bytecode_cache is None:
+            stream_env.bytecode_cache = make_bytecode_cache(settings.template_cache_dir / "async")
+        envs = (templates.env, stream_env)
+    names = envs[0].list_templates(extensions=["html"])
+    for env in envs:
+        for name in names:
+            env.get_template(name)
+    return len(names)
 
 
 def render_template(
-    request, template_name: str, context: dict, status_code: int = 200, cookies: dict = None
+    request, template_name: str, context: dict, status_code: int = 200, cookies: dict = None,
+    headers: dict = None
 ):
     """
     Render a template with the specified context and return an HTML response.
@@ -32,6 +150,7 @@ def render_template(
         context: A dictionary containing the context data for the template.
         status_code: The HTTP status code for the response (default: 200).
         cookies: Optional dictionary containing cookies to be set in the response.
+        headers: Optional dictionary of extra response headers, such as `cache_validators`.
 
     Returns:
         An HTMLResponse containing the rendered template.
@@ -41,7 +160,7 @@ def render_template(
     ctx_copy.update({"request": request})
 
     html_string = templates.get_template(template_name).render(ctx_copy)
-    response = HTMLResponse(html_string, status_code=status_code)
+    response = HTMLResponse(html_string, status_code=status_code, headers=headers)
 
     if cookies:
         for k, v in cookies.items():
@@ -50,6 +169,122 @@ def render_template(
     return response
 
 
+def stream_template(request, template_name: str, context: dict, status_code: int = 200):
+    """
+    Render a template incrementally and stream it as an HTML response.
+
+    The page is sent as Jinja produces it, so the head goes out before the body is complete.
+    Jinja's output is grouped into chunks of settings.template_stream_buffer pieces, as
+    `TemplateStream.enable_buffering` does for sync templates, so each row does not become
+    several tiny writes. Async iterables in the context, such as `database.RowStream`, are
+    consumed by the template's loops one page at a time, which keeps memory bounded by the page
+    size.
+
+    Args:
+        request: The FastAPI request object.
+        template_name: The name of the template to render.
+        context: A dictionary containing the context data for the template.
+        status_code: The HTTP status code for the response (default: 200).
+
+    Returns:
+        A StreamingResponse producing the rendered template.
+
+    """
+    ctx_copy = context.copy()
+    ctx_copy.update({"request": request})
+
+    chunks = stream_env.get_template(template_name).generate_async(ctx_copy)
+    return StreamingResponse(
+        _buffered(chunks, settings.template_stream_buffer), status_code=status_code, media_type="text/html"
+    )
+
+
+async def _buffered(chunks, size):
+    buffer = []
+    async for chunk in chunks:
+        buffer.append(chunk)
+        if len(buffer) >= size:
+            yield "".join(buffer)
+            buffer = []
+    if buffer:
+        yield "".join(buffer)
+
+
+@lru_cache
+def template_version():
+    """
+    Returns a digest of the template files' modification times, so ETags change on deploys
+    that change templates.
+    """
+    mtimes = sorted(
+        (str(path), path.stat().st_mtime_ns) for path in settings.template_dir.rglob("*.html")
+    )
+    return hashlib.sha256(repr(mtimes).encode()).hexdigest()[:16]
+
+
+def cache_validators(request, *versions):
+    """
+    Build the conditional-request headers for a page.
+
+    The weak ETag is a digest of the given row versions together with everything else the
+    rendered page depends on: the templates, the query string, whether it is an HTMX partial and
+    the signed-in user. Responses vary on the cookie, are private to signed-in users, and must
+    be revalidated before reuse.
+
+    Args:
+        request: The FastAPI request object.
+        *versions: Values identifying the version of the data the page is rendered from.
+
+    Returns:
+        A dictionary of response headers.
+
+    """
+    user = request.user.username if request.user.is_authenticated else None
+    parts = (template_version(), request.url.path, request.url.query, is_htmx(request), user, versions)
+    headers = {
+        "ETag": f'W/"{hashlib.sha256(repr(parts).encode()).hexdigest()[:32]}"',
+        "Cache-Control": "private, no-cache" if user else "public, no-cache",
+        "Vary": "Cookie, HX-Request",
+    }
+    return headers
+
+
+def is_not_modified(request, headers: dict):
+    """
+    Check whether the client's cached copy matches the page's validators.
+
+    `If-None-Match` is compared weakly against the ETag. Pages carry no Last-Modified, since
+    their row timestamps do not cover everything they render, so `If-Modified-Since` is ignored.
+
+    Args:
+        request: The FastAPI request object.
+        headers: The headers returned by `cache_validators`.
+
+    Returns:
+        True if a 304 can be returned instead of rendering the page.
+
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        etag = _opaque_tag(headers["ETag"])
+        return any(_opaque_tag(tag) == etag for tag in if_none_match.split(","))
+    return False
+
+
+def _opaque_tag(etag: str):
+    etag = etag.strip()
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def not_modified(headers: dict):
+    """
+    Create an empty 304 response carrying the page's validators.
+    """
+    return Response(status_code=304, headers=headers)
+
+
 def redirect_to(url: str, cookies: dict = None, remove_session: bool = False):
     """
     Create a redirect response to the specified URL with optional cookies and session removal.
@@ -76,10 +311,12 @@ def redirect_to(url: str, cookies: dict = None, remove_session: bool = False):
     return response
 
 
-def found_object_or_404(ClassName, **kwargs):
+async def found_object_or_404(ClassName, **kwargs):
     """
     Retrieve an object of the specified class using the provided kwargs or return None if not found.
 
+    Models that define a `get_cached` read-through lookup are fetched through it.
+
     Args:
         ClassName: The class of the object to retrieve.
         **kwargs: Keyword arguments for filtering the objects.
@@ -88,8 +325,12 @@ def found_object_or_404(ClassName, **kwargs):
         An object of the specified class if found, otherwise None.
 
     """
+    get_cached = getattr(ClassName, "get_cached", None)
     try:
-        obj = ClassName.objects.get(**kwargs)
+        if get_cached is not None:
+            obj = await get_cached(**kwargs)
+        else:
+            obj = await database.get(ClassName, **kwargs)
     except DoesNotExist:
         raise StarletteHTTPException(status_code=404)
     except MultipleObjectsReturned:
@@ -99,5 +340,66 @@ def found_object_or_404(ClassName, **kwargs):
     return obj
 
 
+def capped_page_size(page_size: int = None):
+    """
+    Returns the requested page size, or settings.page_size if none was given, capped at
+    settings.max_page_size.
+    """
+    return min(page_size or settings.page_size, settings.max_page_size)
+
+
+async def get_page_or_400(ClassName, cursor: str = None, page_size: int = None, **kwargs):
+    """
+    Retrieve one page of objects of the specified class, or raise a 400 for a bad cursor.
+
+    Args:
+        ClassName: The class of the objects to retrieve.
+        cursor: The opaque cursor returned with the previous page, if any.
+        page_size: The requested page size, capped at settings.max_page_size.
+        **kwargs: Keyword arguments for filtering the objects.
+
+    Returns:
+        A tuple of the objects on the page and the cursor of the next page (None on the last page).
+
+    """
+    page_size = capped_page_size(page_size)
+    try:
+        return await database.fetch_page(ClassName, cursor=cursor, page_size=page_size, **kwargs)
+    except InvalidCursorException:
+        raise StarletteHTTPException(status_code=400)
+
+
+async def stream_rows_or_400(ClassName, cursor: str = None, page_size: int = None, **kwargs):
+    """
+    Create a `database.RowStream` of objects of the specified class, or raise a 400 for a bad cursor.
+
+    The stream reads up to settings.stream_max_pages pages and exposes the cursor of the next
+    page as `next_cursor` once it has been consumed. Its first page is read before returning,
+    so a cursor the database rejects still becomes a 400 instead of a truncated page.
+
+    Args:
+        ClassName: The class of the objects to stream.
+        cursor: The opaque cursor returned with the previous page, if any.
+        page_size: The requested page size, capped at settings.max_page_size.
+        **kwargs: Keyword arguments for filtering the objects.
+
+    Returns:
+        A database.RowStream over the objects.
+
+    """
+    page_size = capped_page_size(page_size)
+    try:
+        stream = database.RowStream(
+            ClassName, cursor=cursor, page_size=page_size, max_pages=settings.stream_max_pages, **kwargs
+        )
+        return await stream.prefetch()
+    except InvalidCursorException:
+        raise StarletteHTTPException(status_code=400)
+    except Exception:
+        if cursor:
+            raise StarletteHTTPException(status_code=400)
+        raise
+
+
 def is_htmx(request: Request):
     return request.headers.get("hx-request") == "true"
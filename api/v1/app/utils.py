@@ -31,3 +31,31 @@ def valid_schema_data(schema, rw_data: dict):
             errors = [{"loc": "non_field_error", "msg": "An error occurred", "type": "server_error"}]
 
     return data, errors
+
+
+async def valid_schema_data_async(schema, rw_data: dict, **kwargs):
+    """
+    Validates the raw data against the provided Pydantic schema, then awaits the schema's
+    ``validate_async`` hook for checks that need the database.
+
+    Pydantic validators are synchronous, so schemas keep their database lookups in an async
+    ``validate_async`` classmethod instead; this keeps those lookups off the event loop.
+
+    Args:
+        schema: The Pydantic schema to validate against.
+        rw_data: A dictionary of raw data to be validated.
+        **kwargs: Extra keyword arguments passed to ``validate_async``.
+
+    Returns:
+        A tuple containing the validated data and a list of validation errors, in the same
+        format as `valid_schema_data`.
+
+    """
+    data, errors = valid_schema_data(schema, rw_data)
+    if errors or not hasattr(schema, "validate_async"):
+        return data, errors
+    try:
+        data = await schema.validate_async(data, **kwargs)
+    except ValueError as e:
+        errors = [{"loc": ["__root__"], "msg": str(e), "type": "value_error"}]
+    return data, errors
@@ -0,0 +1,92 @@
+import os
+import re
+from types import SimpleNamespace
+
+import pytest
+
+for name, value in {
+    "ASTRADB_KEYSPACE": "videohub_test",
+    "ASTRA_DB_CLIENT_ID": "test",
+    "ASTRA_DB_CLIENT_SECRET": "test",
+    "SECRET_KEY": "test-secret",
+    "ALGORITHM": "HS256",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "30",
+}.items():
+    os.environ.setdefault(name, value)
+
+
+def statement_text(statement):
+    """
+    Returns the CQL of a driver statement or query string; batches are reported as "BATCH".
+    """
+    if isinstance(statement, str):
+        return statement
+    if hasattr(statement, "query_string"):
+        return statement.query_string
+    if hasattr(statement, "prepared_statement"):
+        return statement.prepared_statement.query_string
+    return "BATCH"
+
+
+def reads(cql, table):
+    """
+    Returns whether a query string is a SELECT from the given table, in any keyspace.
+    """
+    return re.match(rf"SELECT .* FROM (\w+\.)?{table}\b(?!_)", cql) is not None
+
+
+class FakeResponseFuture:
+    def __init__(self, rows, paging_state=None, error=None):
+        self.rows = rows
+        self.paging_state = paging_state
+        self.error = error
+        self.has_more_pages = paging_state is not None
+
+    def result(self):
+        return SimpleNamespace(paging_state=self.paging_state)
+
+    def add_callbacks(self, callback, errback):
+        if self.error is not None:
+            errback(self.error)
+        else:
+            callback(self.rows)
+
+
+class FakeSession:
+    """
+    Stands in for the driver session.
+
+    Every statement is recorded in `statements` as (statement, parameters) and answered with the
+    rows returned by `handler(cql, parameters)`. Statements carrying a fetch size are paged, with
+    the row offset as paging state.
+    """
+    def __init__(self):
+        self.statements = []
+        self.handler = lambda cql, parameters: []
+
+    @property
+    def queries(self):
+        return [statement_text(statement) for statement, _ in self.statements]
+
+    def execute_async(self, statement, parameters=None, paging_state=None):
+        self.statements.append((statement, parameters))
+        try:
+            rows = list(self.handler(statement_text(statement), parameters))
+        except Exception as e:
+            return FakeResponseFuture([], error=e)
+        fetch_size = getattr(statement, "fetch_size", None)
+        if not isinstance(fetch_size, int) or not fetch_size:
+            return FakeResponseFuture(rows)
+        offset = int.from_bytes(paging_state, "big") if paging_state else 0
+        end = offset + fetch_size
+        next_state = end.to_bytes(4, "big") if end < len(rows) else None
+        return FakeResponseFuture(rows[offset:end], next_state)
+
+
+@pytest.fixture
+def session(monkeypatch):
+    from cassandra.cqlengine import connection
+
+    fake = FakeSession()
+    monkeypatch.setattr(connection, "get_session", lambda *args, **kwargs: fake)
+    return fake
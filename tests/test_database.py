@@ -0,0 +1,67 @@
+import asyncio
+import uuid
+
+import pytest
+
+pytest.importorskip("cassandra")
+pytest.importorskip("fastapi")
+pytest.importorskip("jinja2")
+pytest.importorskip("passlib")
+
+from api.v1.app import database
+from api.v1.app.exceptions import InvalidCursorException
+from api.v1.app.models import Video
+
+
+def video_rows(count):
+    return [
+        {"host_id": f"video{index}", "db_id": uuid.uuid4(), "host_service": "youtube",
+         "title": f"Video {index}", "url": None, "user_id": None}
+        for index in range(count)
+    ]
+
+
+def test_fetch_page_follows_cursor(session):
+    session.handler = lambda cql, parameters: video_rows(5)
+
+    async def read_pages():
+        pages = []
+        cursor = None
+        while True:
+            videos, cursor = await database.fetch_page(Video, cursor=cursor, page_size=2)
+            pages.append([video.host_id for video in videos])
+            if cursor is None:
+                return pages
+
+    assert asyncio.run(read_pages()) == [["video0", "video1"], ["video2", "video3"], ["video4"]]
+    assert len(session.statements) == 3
+
+
+def test_row_stream_stops_after_max_pages(session):
+    session.handler = lambda cql, parameters: video_rows(5)
+    stream = database.RowStream(Video, page_size=2, max_pages=2)
+
+    async def read_stream():
+        return [video.host_id async for video in stream]
+
+    assert asyncio.run(read_stream()) == ["video0", "video1", "video2", "video3"]
+    assert stream.next_cursor == database.encode_cursor((4).to_bytes(4, "big"))
+
+
+def test_invalid_cursor_is_rejected():
+    with pytest.raises(InvalidCursorException):
+        database.decode_cursor("a")
+
+
+def test_row_stream_prefetch_reads_the_first_page_once(session):
+    session.handler = lambda cql, parameters: video_rows(5)
+
+    async def read_stream():
+        stream = await database.RowStream(Video, page_size=2, max_pages=None).prefetch()
+        fetched = len(session.statements)
+        return fetched, [video.host_id async for video in stream]
+
+    fetched, host_ids = asyncio.run(read_stream())
+    assert fetched == 1
+    assert host_ids == [f"video{index}" for index in range(5)]
+    assert len(session.statements) == 3
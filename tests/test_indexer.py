@@ -0,0 +1,115 @@
+import asyncio
+import uuid
+
+import pytest
+
+pytest.importorskip("cassandra")
+pytest.importorskip("fastapi")
+pytest.importorskip("jinja2")
+pytest.importorskip("passlib")
+pytest.importorskip("algoliasearch")
+
+from api.v1.app import search_client
+from api.v1.app.indexer import SearchIndexer
+from tests.conftest import reads
+
+PLAYLIST_ID = uuid.uuid4()
+
+
+def change(object_type, object_id):
+    return {"shard": 0, "change_id": uuid.uuid1(), "object_type": object_type, "object_id": str(object_id)}
+
+
+@pytest.fixture
+def pushed(monkeypatch):
+    calls = []
+
+    async def push_changes(records, deleted_ids):
+        calls.append((records, set(deleted_ids)))
+
+    monkeypatch.setattr(search_client, "push_changes", push_changes)
+    return calls
+
+
+def outbox(changes, lease=True, checkpoint=None):
+    pending = [changes]
+
+    def handler(cql, parameters):
+        if ".search_lease " in cql:
+            return [{"[applied]": lease, "owner": None if lease else "another-worker"}]
+        if reads(cql, "search_checkpoint"):
+            return [{"shard": 0, "change_id": checkpoint, "updated": None}] if checkpoint else []
+        if reads(cql, "search_outbox"):
+            if cql.startswith("SELECT change_id"):
+                return changes[:1]
+            return pending.pop() if pending else []
+        if reads(cql, "video"):
+            return [{"host_id": "abc123", "db_id": uuid.uuid1(), "host_service": "youtube",
+                     "title": "Known", "url": "https://youtu.be/abc123", "user_id": None}]
+        return []
+    return handler
+
+
+def test_drain_updates_existing_objects_and_deletes_missing_ones(session, pushed):
+    session.handler = outbox([change("video", "abc123"), change("video", "gone"),
+                              change("playlist", PLAYLIST_ID)])
+
+    assert asyncio.run(SearchIndexer(settle_time=0).drain()) == 3
+
+    [(records, deleted_ids)] = pushed
+    assert [record["objectID"] for record in records] == ["abc123"]
+    assert deleted_ids == {"gone", str(PLAYLIST_ID)}
+
+
+def test_drain_saves_the_checkpoint_and_removes_drained_changes(session, pushed):
+    changes = [change("video", "abc123"), change("video", "abc123")]
+    session.handler = outbox(changes)
+
+    asyncio.run(SearchIndexer(settle_time=0).drain())
+
+    [checkpoint] = [parameters for statement, parameters in session.statements
+                    if ".search_checkpoint " in str(statement) and str(statement).startswith("INSERT")]
+    assert changes[-1]["change_id"] in checkpoint
+    [removed] = [parameters for statement, parameters in session.statements
+                 if str(statement).startswith("DELETE FROM") and ".search_outbox " in str(statement)]
+    assert removed == [0, changes[-1]["change_id"]]
+
+
+def test_drain_resumes_after_the_checkpoint(session, pushed):
+    checkpoint = uuid.uuid1()
+    session.handler = outbox([], checkpoint=checkpoint)
+
+    assert asyncio.run(SearchIndexer(settle_time=0).drain()) == 0
+
+    [(_, parameters)] = [(statement, parameters) for statement, parameters in session.statements
+                         if str(statement).startswith("SELECT") and ".search_outbox " in str(statement)]
+    assert parameters[1] == checkpoint
+
+
+def test_drain_skips_shards_leased_by_another_worker(session, pushed):
+    session.handler = outbox([change("video", "abc123")], lease=False)
+
+    assert asyncio.run(SearchIndexer(settle_time=0).drain()) == 0
+    assert pushed == []
+    assert not any(query.startswith("SELECT *") and reads(query, "search_outbox") for query in session.queries)
+
+
+def test_idle_shard_takes_no_lease(session, pushed):
+    session.handler = outbox([])
+
+    assert asyncio.run(SearchIndexer(settle_time=0).drain()) == 0
+    assert not any(".search_lease " in query for query in session.queries)
+
+
+def test_rebuild_holds_every_shard_lease_until_it_ends(session, pushed):
+    session.handler = outbox([])
+
+    async def scenario():
+        async with SearchIndexer().paused():
+            held = [query for query in session.queries if ".search_lease " in query]
+        return held
+
+    held = asyncio.run(scenario())
+    assert len(held) == search_client.settings.search_outbox_shards
+    assert all(query.startswith("INSERT") for query in held)
+    assert session.queries[-1].startswith("DELETE") and ".search_lease " in session.queries[-1]
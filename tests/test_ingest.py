@@ -0,0 +1,88 @@
+import asyncio
+import uuid
+
+import pytest
+
+pytest.importorskip("cassandra")
+pytest.importorskip("fastapi")
+pytest.importorskip("jinja2")
+pytest.importorskip("passlib")
+
+from api.v1.app.ingest import WatchEventBuffer
+from api.v1.app.models import ResumePosition
+from tests.conftest import reads
+
+
+def event(host_id, user_id=None):
+    return {
+        "host_id": host_id, "user_id": user_id or uuid.uuid4(), "path": f"/api/video/{host_id}",
+        "start_time": 0.0, "end_time": 10.0, "duration": 100.0, "complete": False,
+    }
+
+
+def written(session, table):
+    return [
+        statement
+        for batch, _ in session.statements
+        for _, statement, _ in batch._statements_and_parameters
+        if f".{table} " in statement
+    ]
+
+
+def test_stop_finishes_a_flush_in_progress(session):
+    session.handler = lambda cql, parameters: []
+
+    async def scenario():
+        buffer = WatchEventBuffer(max_pending=100, flush_size=1, flush_interval=60.0, put_timeout=1.0)
+        buffer.start()
+        for index in range(3):
+            await buffer.add(event(f"video{index}"))
+        await asyncio.sleep(0)
+        await buffer.stop()
+        return len(buffer)
+
+    assert asyncio.run(scenario()) == 0
+    assert len(written(session, "watch_event")) == 3
+    assert len(written(session, "resume_position")) == 3
+
+
+def test_flush_caps_batch_size(session):
+    session.handler = lambda cql, parameters: []
+
+    async def scenario():
+        buffer = WatchEventBuffer(max_pending=1000, flush_size=1000, flush_interval=60.0, batch_statements=50)
+        buffer.start()
+        for _ in range(120):
+            await buffer.add(event("popular"))
+        await buffer.stop()
+
+    asyncio.run(scenario())
+    sizes = sorted(
+        len(batch._statements_and_parameters)
+        for batch, _ in session.statements
+        if ".watch_event " in batch._statements_and_parameters[0][1]
+    )
+    assert sizes == [20, 50, 50]
+
+
+def test_resume_backfill_keeps_the_latest_event_per_user_and_video(session):
+    first_user, second_user = uuid.uuid4(), uuid.uuid4()
+    older, newer = uuid.uuid1(), uuid.uuid1()
+
+    def row(host_id, event_id, user_id, end_time):
+        return {"host_id": host_id, "event_id": event_id, "user_id": user_id, "path": None,
+                "start_time": 0.0, "end_time": end_time, "duration": 100.0, "complete": False}
+
+    session.handler = lambda cql, parameters: [
+        row("video0", newer, first_user, 40.0), row("video0", older, first_user, 10.0),
+        row("video0", older, second_user, 20.0), row("video1", older, first_user, 30.0),
+    ] if reads(cql, "watch_event") else []
+
+    assert asyncio.run(ResumePosition.backfill()) == 3
+
+    inserts = [(query, parameters) for query, (_, parameters) in zip(session.queries, session.statements)
+               if query.startswith("INSERT")]
+    end_times = sorted(value for _, parameters in inserts for value in parameters if isinstance(value, float)
+                       and value in (10.0, 20.0, 30.0, 40.0))
+    assert end_times == [20.0, 30.0, 40.0]
+    assert all(" USING TIMESTAMP " in query for query, _ in inserts)
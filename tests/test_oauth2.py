@@ -0,0 +1,29 @@
+import asyncio
+import logging
+import uuid
+
+import pytest
+
+pytest.importorskip("cassandra")
+pytest.importorskip("fastapi")
+pytest.importorskip("jinja2")
+pytest.importorskip("passlib")
+
+from api.v1.app import oauth2, security
+from api.v1.app.models import User
+
+
+def test_rehash_does_not_create_a_partial_users_by_id_row(session, monkeypatch, caplog):
+    async def hashed_async(password):
+        return "new-hash"
+
+    monkeypatch.setattr(security, "hashed_async", hashed_async)
+    session.handler = lambda cql, parameters: [{"[applied]": False}] if cql.endswith("IF EXISTS") else []
+    user = User(email="someone@example.com", user_id=uuid.uuid1(), password="old-hash")
+
+    with caplog.at_level(logging.WARNING):
+        asyncio.run(oauth2.rehash_password(user, "secret"))
+
+    [by_id] = [query for query in session.queries if ".users_by_id " in query]
+    assert by_id.startswith("UPDATE") and by_id.endswith("IF EXISTS")
+    assert not caplog.records
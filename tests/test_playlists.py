@@ -0,0 +1,88 @@
+import asyncio
+import uuid
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("cassandra")
+pytest.importorskip("fastapi")
+pytest.importorskip("jinja2")
+pytest.importorskip("passlib")
+
+from api.v1.app import database
+from api.v1.app.models import Playlist, PlaylistItem
+from tests.conftest import reads
+
+PLAYLIST_ID = uuid.uuid1()
+
+
+def answer(video_exists):
+    def handler(cql, parameters):
+        if reads(cql, "playlist"):
+            return [{"db_id": PLAYLIST_ID, "user_id": None, "updated": datetime.utcnow(),
+                     "host_ids": None, "title": "Favourites"}]
+        if reads(cql, "video"):
+            if not video_exists:
+                return []
+            return [{"host_id": "abc123", "db_id": uuid.uuid1(), "host_service": "youtube",
+                     "title": "Known", "url": "https://youtu.be/abc123", "user_id": None}]
+        if cql.endswith("IF NOT EXISTS"):
+            return [{"[applied]": True}]
+        return []
+    return handler
+
+
+def test_adding_a_known_video_costs_two_reads_and_one_write(session):
+    session.handler = answer(video_exists=True)
+
+    asyncio.run(Playlist.add_video_from_url(PLAYLIST_ID, "https://youtu.be/abc123"))
+
+    assert [query.split()[0] for query in session.queries] == ["SELECT", "SELECT", "BATCH"]
+    batch = session.statements[-1][0]
+    statements = [statement for _, statement, _ in batch._statements_and_parameters]
+    assert [statement.split()[0] for statement in statements] == ["INSERT", "UPDATE"]
+
+
+def test_adding_a_new_video_registers_it(session):
+    session.handler = answer(video_exists=False)
+
+    asyncio.run(Playlist.add_video_from_url(PLAYLIST_ID, "https://youtu.be/abc123"))
+
+    # Playlist and video reads, the registration's conditional insert, its search outbox batch,
+    # and the playlist batch.
+    assert len(session.queries) == 5
+    assert sum(query.endswith("IF NOT EXISTS") for query in session.queries) == 1
+
+
+def test_moving_to_the_end_stays_ahead_of_the_last_entry():
+    last = PlaylistItem.position_between(after=None) + 10.0
+
+    position = PlaylistItem.position_between(after=last)
+
+    assert last < position < last + PlaylistItem.POSITION_STEP
+
+
+def test_backfill_merges_missing_legacy_entries(session, monkeypatch):
+    def handler(cql, parameters):
+        if reads(cql, "playlist"):
+            return [{"db_id": PLAYLIST_ID, "user_id": None, "updated": datetime.utcnow(),
+                     "host_ids": ["a", "b", "c"], "title": "Favourites"}]
+        if reads(cql, "playlist_items"):
+            return [{"playlist_id": PLAYLIST_ID, "position": 5000.0, "item_id": uuid.uuid1(),
+                     "host_id": "b"}]
+        return []
+    session.handler = handler
+    written = []
+    save_batch = database.save_batch
+
+    async def record_batch(instances, *args, **kwargs):
+        written.extend(instances)
+        return await save_batch(instances, *args, **kwargs)
+
+    monkeypatch.setattr(database, "save_batch", record_batch)
+
+    assert asyncio.run(Playlist.backfill_items()) == 1
+
+    assert [(item.host_id, item.position) for item in written] == [
+        ("a", 5000.0 - 2 * PlaylistItem.POSITION_STEP), ("c", 5000.0 - PlaylistItem.POSITION_STEP)
+    ]
@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("cassandra")
+pytest.importorskip("fastapi")
+pytest.importorskip("jinja2")
+pytest.importorskip("passlib")
+pytest.importorskip("algoliasearch")
+
+from api.v1.app import search_client
+from tests.conftest import reads
+
+
+class FakeIndex:
+    def __init__(self, name, client):
+        self.name = name
+        self.client = client
+
+    def exists(self):
+        return True
+
+    def save_objects(self, batch):
+        raise RuntimeError("upload failed")
+
+    def delete(self):
+        self.client.deleted.append(self.name)
+
+
+class FakeClient:
+    def __init__(self):
+        self.deleted = []
+        self.moved = []
+        self.copied = []
+
+    def init_index(self, name):
+        return FakeIndex(name, self)
+
+    def copy_index(self, source, destination, request_options=None):
+        self.copied.append((source, destination, request_options))
+        return FakeTask()
+
+    def move_index(self, source, destination):
+        self.moved.append((source, destination))
+        return FakeTask()
+
+
+class FakeTask:
+    def wait(self):
+        return self
+
+
+def test_failed_swap_rebuild_deletes_the_temporary_index(session, monkeypatch):
+    client = FakeClient()
+    monkeypatch.setattr(search_client, "get_client", lambda: client)
+    monkeypatch.setattr(search_client, "get_index", lambda name=None: client.init_index(name))
+    session.handler = lambda cql, parameters: (
+        [{"host_id": "abc123", "title": "Known"}] if reads(cql, "video") else []
+    )
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(search_client.update_index(swap=True))
+
+    [(_, _, options)] = client.copied
+    assert options == {"scope": ["settings", "synonyms", "rules"]}
+    assert client.moved == []
+    assert len(client.deleted) == 1
+    assert client.deleted[0].startswith(f"{search_client.ALGOLIA_INDEX_NAME}_tmp_")
+
+
+def test_local_index_snapshot_is_built_once_and_shared(session, monkeypatch, tmp_path):
+    monkeypatch.setattr(search_client.settings, "search_backend", "local")
+    monkeypatch.setattr(search_client.settings, "search_local_snapshot", tmp_path / "index.json")
+    session.handler = lambda cql, parameters: (
+        [{"host_id": "abc123", "title": "Known video"}] if reads(cql, "video") else []
+    )
+
+    assert asyncio.run(search_client.load_local_index()) == 1
+    built_at = search_client.local_index_built_at
+    scanned = len(session.statements)
+
+    assert asyncio.run(search_client.load_local_index()) == 1
+    assert len(session.statements) == scanned
+    assert search_client.local_index_built_at == built_at
+    assert search_client.local_index.search("known")["nbHits"] == 1
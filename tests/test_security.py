@@ -0,0 +1,27 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("cassandra")
+pytest.importorskip("fastapi")
+pytest.importorskip("jinja2")
+pytest.importorskip("passlib")
+
+from api.v1.app import security
+from api.v1.app.exceptions import PasswordHashThrottledException
+
+
+def test_throttled_calls_do_not_leak_permits(monkeypatch):
+    monkeypatch.setattr(security.settings, "password_hash_queue_timeout", 0.01)
+
+    async def scenario():
+        semaphore = asyncio.Semaphore(1)
+        monkeypatch.setattr(security, "_semaphore", semaphore)
+        await semaphore.acquire()
+        for _ in range(20):
+            with pytest.raises(PasswordHashThrottledException):
+                await security._run_limited(len, "x")
+        semaphore.release()
+        return await security._run_limited(len, "abc"), semaphore.locked()
+
+    assert asyncio.run(scenario()) == (3, False)
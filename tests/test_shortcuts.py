@@ -0,0 +1,47 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("cassandra")
+pytest.importorskip("fastapi")
+pytest.importorskip("jinja2")
+pytest.importorskip("passlib")
+
+from starlette.exceptions import HTTPException as StarletteHTTPException
+
+from api.v1.app import database, shortcuts
+from api.v1.app.models import Video
+
+
+def test_cursor_rejected_by_the_database_is_a_400(session):
+    def handler(cql, parameters):
+        raise ValueError("Invalid value for the paging state")
+    session.handler = handler
+
+    with pytest.raises(StarletteHTTPException) as error:
+        asyncio.run(shortcuts.stream_rows_or_400(Video, cursor=database.encode_cursor(b"\x00\x01")))
+
+    assert error.value.status_code == 400
+
+
+def test_streamed_output_is_grouped_into_larger_chunks():
+    async def pieces():
+        for index in range(7):
+            yield str(index)
+
+    async def collect():
+        return [chunk async for chunk in shortcuts._buffered(pieces(), 3)]
+
+    assert asyncio.run(collect()) == ["012", "345", "6"]
+
+
+def test_only_the_etag_validates_a_cached_page():
+    headers = {"ETag": 'W/"abc"'}
+
+    def request(**request_headers):
+        return SimpleNamespace(headers=request_headers)
+
+    assert shortcuts.is_not_modified(request(**{"if-none-match": '"abc"'}), headers)
+    assert not shortcuts.is_not_modified(request(**{"if-none-match": '"other"'}), headers)
+    assert not shortcuts.is_not_modified(request(**{"if-modified-since": "Sat, 17 Oct 2026 00:00:00 GMT"}), headers)
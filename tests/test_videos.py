@@ -0,0 +1,46 @@
+import asyncio
+import uuid
+
+import pytest
+
+pytest.importorskip("cassandra")
+pytest.importorskip("fastapi")
+pytest.importorskip("jinja2")
+pytest.importorskip("passlib")
+
+from api.v1.app.exceptions import InvalidUserExceptions
+from api.v1.app.models import Video
+
+
+def test_register_returns_legacy_row_without_inserting(session):
+    legacy_db_id = uuid.uuid1()
+    session.handler = lambda cql, parameters: (
+        [{"host_id": "abc123", "db_id": legacy_db_id, "host_service": "youtube",
+          "title": "Legacy", "url": "https://youtu.be/abc123", "user_id": None}]
+        if cql.startswith("SELECT") else [{"[applied]": True}]
+    )
+
+    video, created = asyncio.run(Video.register("abc123", url="https://youtu.be/abc123"))
+
+    assert not created
+    assert video.db_id == legacy_db_id
+    assert not any(query.startswith("INSERT") for query in session.queries)
+
+
+def test_register_inserts_new_video_with_lightweight_transaction(session):
+    session.handler = lambda cql, parameters: [] if cql.startswith("SELECT") else [{"[applied]": True}]
+
+    video, created = asyncio.run(Video.register("abc123", url="https://youtu.be/abc123"))
+
+    assert created
+    assert video.db_id == Video.db_id_for("abc123")
+    assert session.queries[-1].endswith("IF NOT EXISTS")
+
+
+def test_add_video_for_missing_user_writes_nothing(session):
+    session.handler = lambda cql, parameters: [] if cql.startswith("SELECT") else [{"[applied]": True}]
+
+    with pytest.raises(InvalidUserExceptions):
+        asyncio.run(Video.add_video("https://youtu.be/abc123", user_id=uuid.uuid4()))
+
+    assert all(query.startswith("SELECT") for query in session.queries)
@@ -0,0 +1,35 @@
+import pytest
+
+pytest.importorskip("cassandra")
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+pytest.importorskip("jinja2")
+pytest.importorskip("passlib")
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.authentication import SimpleUser
+
+from api.v1.app.routers.watch_event import router
+
+
+def client():
+    app = FastAPI()
+    app.include_router(router)
+
+    async def authenticated(scope, receive, send):
+        scope["user"] = SimpleUser("alice")
+        await app(scope, receive, send)
+
+    return TestClient(authenticated)
+
+
+def test_binary_and_malformed_frames_get_the_same_error():
+    with client().websocket_connect("/api/watch/ws") as websocket:
+        websocket.send_bytes(b"\x00\x01")
+        binary = websocket.receive_json()
+        websocket.send_text("not json")
+        malformed = websocket.receive_json()
+
+    assert binary == malformed
+    assert binary["type"] == "error"